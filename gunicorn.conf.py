@@ -0,0 +1,65 @@
+# gunicorn settings, see README.md for the available worker profiles
+import logging
+import multiprocessing
+import os
+
+
+log = logging.getLogger("gunicorn.error")
+
+
+def available_cpus():
+    # respects cpu affinity / restrictions of the container if available
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return multiprocessing.cpu_count()
+
+
+profile = os.getenv("GUNICORN_PROFILE", "gthread")
+cpus = available_cpus()
+
+if profile == "sync":
+    worker_class = "sync"
+    workers = 2 * cpus + 1
+    threads = 1
+elif profile == "gthread":
+    # threads share the memory of a worker and wait concurrently
+    # for the database and smtp server
+    worker_class = "gthread"
+    workers = cpus + 1
+    threads = int(os.getenv("GUNICORN_THREADS", 4))
+elif profile == "gevent":
+    # needs the gevent extra, `poetry install -E gevent`
+    worker_class = "gevent"
+    workers = cpus + 1
+    threads = 1
+    worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", 100))
+else:
+    raise ValueError(f"Unknown GUNICORN_PROFILE {profile!r}")
+
+workers = int(os.getenv("WEB_CONCURRENCY", workers))
+bind = f"0.0.0.0:{os.getenv('PORT', 5000)}"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 60))
+
+# the app must be imported after the fork, so every worker
+# creates its own database connections (and gevent can patch everything)
+preload_app = False
+
+
+def post_fork(server, worker):
+    if worker_class != "gevent":
+        return
+
+    try:
+        from psycogreen.gevent import patch_psycopg
+    except ImportError:
+        log.warning("psycogreen not installed, postgresql queries block the worker")
+    else:
+        patch_psycopg()
+
+
+def on_starting(server):
+    log.info(
+        f"Using profile {profile}: {workers} workers of class {worker_class}"
+        f" with {threads} threads on {cpus} cpus"
+    )
@@ -1,7 +1,7 @@
 from flask import Flask, request
-from flask_migrate import Migrate
 from flask_bootstrap import Bootstrap
 from flask_babel import Babel
+from flask_migrate import Migrate
 
 
 from sqlalchemy import event
@@ -9,17 +9,27 @@ from sqlalchemy.engine import Engine
 from sqlite3 import Connection as SQLite3Connection
 
 import logging
+import os
+from jinja2 import FileSystemBytecodeCache
 
 from .config import Config
 from .models import db
 from .authentication import auth, login
 from .mail import mail
-from .errors import not_found_error, internal_error, unauthorized_error
+from .errors import (
+    not_found_error,
+    internal_error,
+    unauthorized_error,
+    too_many_requests_error,
+)
 from .log import setup_logging
 from .events import events
-from .json import JSONEncoderISO8601
+from .json import JSONProvider
 from .main import main
 from .admin_views import create_admin_views
+from .backup import backup_command
+from .retention import retention_command
+from .person_import import import_persons_command
 
 
 @event.listens_for(Engine, "connect")
@@ -41,7 +51,18 @@ def create_app(config=Config):
     db.init_app(app)
     mail.init_app(app)
     login.init_app(app)
+    # also needed outside the cli, e.g. by the backup before migrations
     Migrate(app, db, render_as_batch=True)
+
+    # compiled templates are cached on disk and shared by all workers
+    cache_dir = app.config["JINJA_CACHE_DIR"]
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+    app.jinja_options = {
+        **app.jinja_options,
+        "bytecode_cache": FileSystemBytecodeCache(cache_dir),
+    }
+
     Bootstrap(app)
     babel = Babel(app)
 
@@ -53,10 +74,15 @@ def create_app(config=Config):
     app.register_blueprint(main)
     app.register_blueprint(events, url_prefix="/events")
 
-    app.json_encoder = JSONEncoderISO8601
+    app.cli.add_command(backup_command)
+    app.cli.add_command(retention_command)
+    app.cli.add_command(import_persons_command)
+
+    app.json = JSONProvider(app)
 
     app.register_error_handler(401, unauthorized_error)
     app.register_error_handler(404, not_found_error)
+    app.register_error_handler(429, too_many_requests_error)
     app.register_error_handler(500, internal_error)
 
     setup_logging(app)
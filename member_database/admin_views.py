@@ -1,14 +1,36 @@
+import io
 import json
 
-from flask import abort
+from flask import abort, flash, g
 from flask_login import current_user
 from flask_admin import Admin, expose, AdminIndexView
+from flask_admin.actions import action
 from flask_admin.contrib.sqla import ModelView
+from flask_admin.contrib.sqla.ajax import QueryAjaxModelLoader
+from flask_admin.contrib.sqla.filters import BaseSQLAFilter
+from flask_admin.helpers import get_redirect_target
 from flask_admin.form import fields
+from sqlalchemy import func
+from sqlalchemy.orm import selectinload
 from wtforms.fields import PasswordField
+from wtforms.validators import ValidationError
 
-from .models import db, Person, TUStatus
-from .events import Event, EventRegistration
+from .models import db, Person, MembershipStatus, TUStatus, search_filter
+from .models.counts import EstimatedCountQuery
+from .events import (
+    Event,
+    EventRegistration,
+    promote_waitinglist,
+    send_promotion_mail,
+    archive_event,
+    restore_event,
+    set_registration_open,
+    set_registration_status,
+)
+from .main import set_membership_status, send_welcome_mail
+from .forms import PersonImportForm
+from .person_import import import_persons
+from .events.data_fields import create_data_indexes, data_equals, parse_value
 from .authentication import User, Role, AccessLevel, handle_needs_login, ACCESS_LEVELS
 
 
@@ -22,6 +44,78 @@ class PrettyJSONField(fields.JSONField):
             return ""
 
 
+class DataFieldFilter(BaseSQLAFilter):
+    """Filter registrations by a field of their data, e.g. ``degree=Master``"""
+
+    def validate(self, value):
+        field, sep, _ = value.partition("=")
+        return bool(sep and field.strip())
+
+    def apply(self, query, value, alias=None):
+        field, _, value = value.partition("=")
+        return query.filter(data_equals(field.strip(), parse_value(value.strip())))
+
+    def operation(self):
+        return "Feld=Wert"
+
+
+class PersonSearchMixin:
+    """
+    Search persons by name and email using the search index instead of
+    ``LIKE '%...%'`` on the columns, see ``models.search``.
+    ``person_id_column`` names the column of the listed model holding
+    the id of the person.
+    """
+
+    person_id_column = "id"
+    column_searchable_list = ["name", "email"]
+
+    def search_placeholder(self):
+        return "Name, Email (~ für unscharfe Suche)"
+
+    def get_list(self, page, sort_column, sort_desc, search, filters, *args, **kwargs):
+        # the search is applied by get_query and get_count_query,
+        # flask-admin would add its LIKE filters for the search
+        g.person_search = search
+        try:
+            return super().get_list(
+                page, sort_column, sort_desc, None, filters, *args, **kwargs
+            )
+        finally:
+            g.pop("person_search", None)
+
+    def apply_person_search(self, query):
+        search = g.get("person_search")
+        if not search:
+            return query
+        return query.filter(
+            search_filter(getattr(self.model, self.person_id_column), search)
+        )
+
+    def get_query(self):
+        return self.apply_person_search(super().get_query())
+
+    def get_count_query(self):
+        return self.apply_person_search(super().get_count_query())
+
+
+class PersonAjaxLoader(QueryAjaxModelLoader):
+    """Relationship picker for persons, using the search index"""
+
+    def __init__(self, name, session):
+        super().__init__(name, session, Person, fields=["name", "email"])
+
+    def get_list(self, term, offset=0, limit=10):
+        return (
+            self.get_query()
+            .filter(search_filter(Person.id, term))
+            .order_by(Person.name, Person.id)
+            .offset(offset)
+            .limit(limit)
+            .all()
+        )
+
+
 class IndexView(AdminIndexView):
     @expose("/")
     def index(self):
@@ -36,6 +130,11 @@ class AuthorizedView(ModelView):
     can_view_details = True
     details_modal = True
 
+    # "exact" counts all rows for the pager on every page,
+    # "estimate" uses EstimatedCountQuery for large tables,
+    # ``simple_list_pager = True`` skips counting, only showing prev / next
+    count_mode = "exact"
+
     def __init_subclass__(cls):
         """Add a subclasses access level to the set of access levels"""
         ACCESS_LEVELS.add(cls.access_level)
@@ -45,6 +144,13 @@ class AuthorizedView(ModelView):
             self.access_level
         )
 
+    def get_count_query(self):
+        if self.count_mode == "estimate":
+            return EstimatedCountQuery(func.count("*"), self.session()).select_from(
+                self.model
+            )
+        return super().get_count_query()
+
     def inaccessible_callback(self, name, **kwargs):
         if current_user.is_authenticated:
             # we have a user, bot insufficient access
@@ -54,7 +160,40 @@ class AuthorizedView(ModelView):
             return handle_needs_login()
 
 
-class EventView(AuthorizedView):
+class WaitinglistMixin:
+    """
+    Promote registrations from the waiting list when an edit frees places,
+    e.g. by canceling a confirmed registration or raising max_participants.
+
+    The promotion happens in the same transaction as the edit,
+    mails are only sent after it was committed.
+    """
+
+    # attribute of the model holding the event, None if the model is the event
+    event_attribute = None
+
+    def get_event(self, model):
+        if self.event_attribute is None:
+            return model
+        return getattr(model, self.event_attribute)
+
+    def on_model_change(self, form, model, is_created):
+        super().on_model_change(form, model, is_created)
+        # an edited registration put on the waiting list stays there,
+        # flush to have the id of a new one
+        self.session.flush()
+        exclude_ids = () if self.event_attribute is None else (model.id,)
+        g.promoted_registrations = promote_waitinglist(
+            self.get_event(model), exclude_ids
+        )
+
+    def after_model_change(self, form, model, is_created):
+        super().after_model_change(form, model, is_created)
+        for registration in g.pop("promoted_registrations", []):
+            send_promotion_mail(registration)
+
+
+class EventView(WaitinglistMixin, AuthorizedView):
     access_level = "event_admin"
     column_list = [
         "name",
@@ -62,6 +201,7 @@ class EventView(AuthorizedView):
         "max_participants",
         "force_tu_mail",
         "registration_open",
+        "archived_at",
     ]
     column_filters = [
         "name",
@@ -69,8 +209,15 @@ class EventView(AuthorizedView):
         "force_tu_mail",
         "registration_open",
         "notify_email",
+        "archived_at",
+    ]
+    # archiving moves registrations, so it is only possible via the actions
+    form_excluded_columns = [
+        "registrations",
+        "archived_registrations",
+        "archived_at",
+        "registration_counts",
     ]
-    form_excluded_columns = ["registrations"]
     column_editable_list = ["name", "registration_open"]
     column_descriptions = {"description": "HTML is allowed in this field."}
     form_widget_args = {
@@ -85,11 +232,65 @@ class EventView(AuthorizedView):
     }
     form_overrides = {"registration_schema": PrettyJSONField}
 
+    def on_model_change(self, form, event, is_created):
+        # new registrations would go to the live table, but the views
+        # of an archived event only read the archive
+        if event.archived_at is not None and event.registration_open:
+            raise ValidationError(
+                "Archivierte Veranstaltungen können nicht geöffnet werden,"
+                " sie müssen erst wiederhergestellt werden"
+            )
+        super().on_model_change(form, event, is_created)
+
+    def after_model_change(self, form, event, is_created):
+        super().after_model_change(form, event, is_created)
+        # make the new data fields of the schema filterable
+        create_data_indexes(event)
+        self.session.commit()
+
+    def apply_archive_action(self, ids, func, message):
+        n_events = 0
+        for event in Event.query.filter(Event.id.in_(ids)):
+            try:
+                func(event)
+            except ValueError as e:
+                flash(str(e), "danger")
+                continue
+            n_events += 1
+        self.session.commit()
+        flash(f"{n_events} Veranstaltung(en) {message}", "success")
+
+    @action(
+        "archive",
+        "Archivieren",
+        "Die Anmeldungen der ausgewählten Veranstaltungen archivieren?",
+    )
+    def action_archive(self, ids):
+        self.apply_archive_action(ids, archive_event, "archiviert")
+
+    @action("restore", "Wiederherstellen")
+    def action_restore(self, ids):
+        self.apply_archive_action(ids, restore_event, "wiederhergestellt")
+
+    def apply_registration_open(self, ids, registration_open, message):
+        n = set_registration_open([int(i) for i in ids], registration_open)
+        self.session.commit()
+        flash(f"Anmeldung für {n} Veranstaltung(en) {message}", "success")
+
+    @action("open", "Anmeldung öffnen")
+    def action_open(self, ids):
+        self.apply_registration_open(ids, True, "geöffnet")
+
+    @action("close", "Anmeldung schließen")
+    def action_close(self, ids):
+        self.apply_registration_open(ids, False, "geschlossen")
+
 
 class RoleView(AuthorizedView):
     column_display_pk = True
     column_list = ["id", "access_levels", "users"]
     form_columns = ["id", "access_levels", "users"]
+    form_ajax_refs = {"users": {"fields": ["username"], "order_by": "username"}}
     access_level = "role_admin"
 
 
@@ -100,13 +301,16 @@ class AccessLevelView(AuthorizedView):
     access_level = "access_level_admin"
 
 
-class EventRegistrationView(AuthorizedView):
+class EventRegistrationView(WaitinglistMixin, AuthorizedView):
     access_level = "event_registration_admin"
+    count_mode = "estimate"
+    event_attribute = "event"
     column_filters = [
         Event.id,
         Event.name,
         Person.email,
         Person.membership_status_id,
+        DataFieldFilter(EventRegistration.data, "Data"),
     ]
 
     form_columns = [
@@ -117,10 +321,53 @@ class EventRegistrationView(AuthorizedView):
         "data",
         "timestamp",
     ]
+    # pick persons and events by typing instead of loading all into the form
+    form_ajax_refs = {
+        "person": PersonAjaxLoader("person", db.session),
+        "event": {"fields": ["name"], "order_by": "name"},
+    }
+
+    def on_model_delete(self, registration):
+        super().on_model_delete(registration)
+        g.registration_event = registration.event
+
+    def after_model_delete(self, registration):
+        super().after_model_delete(registration)
+        # deleting a confirmed registration also frees a place
+        promoted = promote_waitinglist(g.pop("registration_event"))
+        self.session.commit()
+        for promoted_registration in promoted:
+            send_promotion_mail(promoted_registration)
+
+    def apply_status_action(self, ids, status_name):
+        n, promoted = set_registration_status([int(i) for i in ids], status_name)
+        self.session.commit()
+        for registration in promoted:
+            send_promotion_mail(registration)
+        flash(f"Status von {n} Anmeldung(en) auf {status_name} gesetzt", "success")
+        if promoted:
+            flash(f"{len(promoted)} Anmeldung(en) von der Warteliste bestätigt", "info")
+
+    @action("status_confirmed", "Status: confirmed")
+    def action_status_confirmed(self, ids):
+        self.apply_status_action(ids, "confirmed")
 
+    @action("status_waitinglist", "Status: waitinglist")
+    def action_status_waitinglist(self, ids):
+        self.apply_status_action(ids, "waitinglist")
 
-class PersonView(AuthorizedView):
+    @action(
+        "status_canceled",
+        "Status: canceled",
+        "Die ausgewählten Anmeldungen stornieren?",
+    )
+    def action_status_canceled(self, ids):
+        self.apply_status_action(ids, "canceled")
+
+
+class PersonView(PersonSearchMixin, AuthorizedView):
     access_level = "person_admin"
+    count_mode = "estimate"
     column_list = [
         "name",
         "email",
@@ -130,17 +377,88 @@ class PersonView(AuthorizedView):
         "joining_date",
     ]
     column_filters = ["name", "email", Person.membership_status_id]
+    # registrations are edited in EventRegistrationView
+    form_excluded_columns = ["event_registrations", "archived_event_registrations"]
+    form_ajax_refs = {"user": {"fields": ["username"], "order_by": "username"}}
+    list_template = "admin/person_list.html"
+    # rows with errors shown after an import
+    import_max_errors = 100
+
+    def get_query(self):
+        # the list shows the user and registrations of every person
+        return (
+            super()
+            .get_query()
+            .options(
+                selectinload(Person.user), selectinload(Person.event_registrations)
+            )
+        )
+
+    def apply_membership_action(self, ids, status):
+        n, new_members = set_membership_status([int(i) for i in ids], status)
+        self.session.commit()
+        for new_member in new_members:
+            send_welcome_mail(new_member)
+        flash(f"Mitgliedsstatus von {n} Person(en) auf {status} gesetzt", "success")
+
+    @action(
+        "membership_confirmed",
+        "Mitgliedschaft bestätigen",
+        "Neue Mitglieder bekommen eine Willkommens-Mail, fortfahren?",
+    )
+    def action_membership_confirmed(self, ids):
+        self.apply_membership_action(ids, MembershipStatus.CONFIRMED)
+
+    @action("membership_denied", "Mitgliedschaft ablehnen")
+    def action_membership_denied(self, ids):
+        self.apply_membership_action(ids, MembershipStatus.DENIED)
+
+    @action("membership_canceled", "Mitgliedschaft beenden")
+    def action_membership_canceled(self, ids):
+        self.apply_membership_action(ids, MembershipStatus.CANCELED)
+
+    @expose("/import/", methods=["GET", "POST"])
+    def import_view(self):
+        return_url = get_redirect_target() or self.get_url(".index_view")
+        form = PersonImportForm()
+        report = None
+
+        if form.validate_on_submit():
+            # werkzeug spools large uploads to disk, the file is streamed
+            lines = io.TextIOWrapper(
+                form.file.data.stream, encoding="utf-8-sig", newline=""
+            )
+            try:
+                report = import_persons(
+                    lines,
+                    status=form.membership_status.data or None,
+                    dry_run=form.dry_run.data,
+                )
+            except ValueError as e:
+                flash(f"Import fehlgeschlagen: {e}", "danger")
+
+        return self.render(
+            "admin/person_import.html",
+            form=form,
+            report=report,
+            dry_run=form.dry_run.data,
+            max_errors=self.import_max_errors,
+            return_url=return_url,
+        )
 
 
 class TUStatusView(AuthorizedView):
     access_level = "person_admin"
 
 
-class UserView(AuthorizedView):
+class UserView(PersonSearchMixin, AuthorizedView):
     access_level = "user_admin"
+    person_id_column = "person_id"
+    column_searchable_list = ["person.name", "person.email"]
     column_list = ["username", "person", "roles"]
     column_filters = ["username", Person.email]
     form_excluded_columns = ["password_hash"]
+    form_ajax_refs = {"person": PersonAjaxLoader("person", db.session)}
     form_extra_fields = {
         "new_password": PasswordField("New Password"),
     }
@@ -9,7 +9,7 @@ from flask import (
     current_app,
 )
 from flask_login import logout_user, current_user, login_user
-from itsdangerous import SignatureExpired, BadData, URLSafeTimedSerializer
+from itsdangerous import SignatureExpired, BadData
 
 
 from .login import (
@@ -22,9 +22,11 @@ from .login import (
 from .models import AccessLevel, Role, User, get_user_by_name_or_email
 from .forms import LoginForm, SendPasswordResetForm, PasswordResetForm
 
-from ..utils import get_or_create, ext_url_for
+from ..utils import get_or_create, ext_url_for, retry_on_integrity_error
 from ..models import db
 from ..mail import send_email
+from ..ratelimit import rate_limit
+from ..tokens import dumps_token, loads_token, PASSWORD_RESET_SALT
 
 
 __all__ = [
@@ -46,6 +48,7 @@ auth = Blueprint("auth", __name__, template_folder="templates")
 
 
 @auth.before_app_first_request
+@retry_on_integrity_error
 def init_database():
     for access_level in ACCESS_LEVELS:
         get_or_create(AccessLevel, id=access_level)
@@ -78,6 +81,7 @@ def login_page():
 
 
 @auth.route("/password_reset/", methods=["GET", "POST"])
+@rate_limit("password_reset", address_field="user_or_email")
 def send_password_reset():
     form = SendPasswordResetForm()
 
@@ -124,8 +128,7 @@ def logout():
 
 
 def send_password_reset_mail(person):
-    ts = URLSafeTimedSerializer(current_app.config["SECRET_KEY"])
-    token = ts.dumps(person.email, salt="password-reset")
+    token = dumps_token(person.email, salt=PASSWORD_RESET_SALT)
 
     link = ext_url_for("auth.reset_password", token=token)
 
@@ -138,5 +141,4 @@ def send_password_reset_mail(person):
 
 
 def load_reset_token(token):
-    ts = URLSafeTimedSerializer(current_app.config["SECRET_KEY"])
-    return ts.loads(token, salt="password-reset", max_age=10 * 60)
+    return loads_token(token, salt=PASSWORD_RESET_SALT, max_age=10 * 60)
@@ -0,0 +1,143 @@
+from datetime import datetime
+from pathlib import Path
+import gzip
+import logging
+import shutil
+import sqlite3
+import subprocess
+import tempfile
+import time
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from .models import db
+
+
+log = logging.getLogger(__name__)
+
+PREFIX = "memberdb-"
+
+
+def backup_postgres(url, path):
+    """Compressed custom format dump, verified by reading its table of contents"""
+    subprocess.run(
+        ["pg_dump", "--format=custom", "--compress=6", f"--file={path}", url],
+        check=True,
+    )
+    subprocess.run(
+        ["pg_restore", "--list", str(path)], check=True, stdout=subprocess.DEVNULL
+    )
+
+
+def backup_sqlite(database, path):
+    """Consistent copy using the sqlite backup api, checked and gzip compressed"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        copy = Path(tmpdir) / "backup.sqlite"
+
+        src = sqlite3.connect(database)
+        dst = sqlite3.connect(copy)
+        try:
+            src.backup(dst)
+            (result,) = dst.execute("PRAGMA integrity_check").fetchone()
+        finally:
+            src.close()
+            dst.close()
+
+        if result != "ok":
+            raise RuntimeError(f"Integrity check of backup failed: {result}")
+
+        with open(copy, "rb") as f_in, gzip.open(path, "wb") as f_out:
+            shutil.copyfileobj(f_in, f_out)
+
+
+def create_backup(directory):
+    """Create a backup of the database in ``directory``, returns its path"""
+    url = db.engine.url
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    timestamp = datetime.now().strftime("%Y-%m-%dT%H%M%S")
+    if url.get_backend_name() == "postgresql":
+        path = directory / f"{PREFIX}{timestamp}.dump"
+        backup = backup_postgres
+        # pg_dump does not know the sqlalchemy driver suffix
+        source = url.set(drivername="postgresql").render_as_string(hide_password=False)
+    elif url.get_backend_name() == "sqlite":
+        path = directory / f"{PREFIX}{timestamp}.sqlite.gz"
+        backup = backup_sqlite
+        source = url.database
+    else:
+        raise ValueError(f"Backups for {url.get_backend_name()} are not supported")
+
+    # write to a temporary file first, so only verified backups
+    # end up under the final name and count for the retention
+    tmp_path = path.with_name("." + path.name)
+    try:
+        backup(source, tmp_path)
+        tmp_path.rename(path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+    log.info(f"Created backup {path} ({path.stat().st_size / 1e6:.1f} MB)")
+    return path
+
+
+def apply_retention(directory, keep):
+    """Remove all but the newest ``keep`` backups, returns the removed files"""
+    backups = sorted(Path(directory).glob(f"{PREFIX}*"), reverse=True)
+    removed = backups[keep:]
+    for path in removed:
+        log.info(f"Removing old backup {path}")
+        path.unlink()
+    return removed
+
+
+def migrations_pending():
+    from alembic.migration import MigrationContext
+    from alembic.script import ScriptDirectory
+
+    config = current_app.extensions["migrate"].migrate.get_config()
+    heads = set(ScriptDirectory.from_config(config).get_heads())
+    with db.engine.connect() as connection:
+        current = set(MigrationContext.configure(connection).get_current_heads())
+    return current != heads
+
+
+@click.command("backup")
+@click.option("--directory", help="Where to store the backups [BACKUP_DIR]")
+@click.option("--keep", type=int, help="Number of backups to keep [BACKUP_KEEP]")
+@click.option(
+    "--every",
+    type=float,
+    help="Keep running and create a backup every EVERY seconds",
+)
+@click.option(
+    "--if-migrations-pending",
+    is_flag=True,
+    help="Only create a backup if `flask db upgrade` would change the database",
+)
+@with_appcontext
+def backup_command(directory, keep, every, if_migrations_pending):
+    """Create a verified, compressed backup of the database"""
+    directory = directory or current_app.config["BACKUP_DIR"]
+    keep = keep or current_app.config["BACKUP_KEEP"]
+
+    if if_migrations_pending and not migrations_pending():
+        click.echo("No migrations pending, skipping backup")
+        return
+
+    while True:
+        try:
+            path = create_backup(directory)
+            click.echo(f"Created backup {path}")
+            apply_retention(directory, keep)
+        except Exception:
+            if every is None:
+                raise
+            log.exception("Creating a backup failed")
+
+        if every is None:
+            break
+        time.sleep(every)
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -10,8 +11,45 @@ class Config:
     )
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # optional read replica, used by read-only listing and json endpoints
+    SQLALCHEMY_BINDS = (
+        {"replica": os.environ["DATABASE_REPLICA_URL"]}
+        if os.getenv("DATABASE_REPLICA_URL")
+        else {}
+    )
+    # connection pool for postgresql, sqlite does not use a pool.
+    # behind PgBouncer in transaction mode, the app must not keep its own
+    # pool and should not rely on session state of the server connection
+    DATABASE_PGBOUNCER = os.getenv("DATABASE_PGBOUNCER", "").lower() == "true"
+    DATABASE_POOL_SIZE = int(os.getenv("DATABASE_POOL_SIZE", 5))
+    DATABASE_MAX_OVERFLOW = int(os.getenv("DATABASE_MAX_OVERFLOW", 10))
+    DATABASE_POOL_TIMEOUT = float(os.getenv("DATABASE_POOL_TIMEOUT", 30))
+    DATABASE_POOL_RECYCLE = int(os.getenv("DATABASE_POOL_RECYCLE", 1800))
+    DATABASE_POOL_PRE_PING = (
+        os.getenv("DATABASE_POOL_PRE_PING", "true").lower() == "true"
+    )
+
+    # WAL mode, relaxed fsync and immediate write transactions for sqlite,
+    # see member_database/models/sqlite.py
+    SQLITE_PROFILE = os.getenv("SQLITE_PROFILE", "").lower() == "true"
+    # milliseconds to wait for the write lock
+    SQLITE_BUSY_TIMEOUT = int(os.getenv("SQLITE_BUSY_TIMEOUT", 5000))
+
+    # a client that wrote something reads from the primary for this
+    # long, so it does not miss its own changes due to replication lag
+    DATABASE_REPLICA_STICKY_SECONDS = int(
+        os.getenv("DATABASE_REPLICA_STICKY_SECONDS", 10)
+    )
+
     # secret key is needed for sessions and tokens
     SECRET_KEY = os.environ["SECRET_KEY"]
+    # previous secret keys, newest first, tokens signed with them stay valid
+    SECRET_KEY_FALLBACKS = [
+        key for key in os.getenv("SECRET_KEY_FALLBACKS", "").split(",") if key
+    ]
+
+    # used to build urls in mails sent outside of requests
+    EXTERNAL_SERVER_NAME = os.getenv("SERVER_NAME") or "localhost:5000"
 
     # needed for url_for
     USE_HTTPS = os.getenv("USE_HTTPS", "").lower() == "true"
@@ -28,9 +66,44 @@ class Config:
     MAIL_USE_SSL = os.getenv("MAIL_USE_SSL", "").lower() == "true"
     MAIL_USERNAME = os.environ["MAIL_USERNAME"]
     MAIL_PASSWORD = os.environ["MAIL_PASSWORD"]
+    # seconds to wait for the smtp server
+    MAIL_TIMEOUT = int(os.getenv("MAIL_TIMEOUT", 30))
+    # mails per smtp connection when sending many, e.g. a mail merge
+    MAIL_BATCH_SIZE = int(os.getenv("MAIL_BATCH_SIZE", 100))
 
     LOG_FILE = os.environ.get("LOG_FILE")
 
+    # database backups created by `flask backup`
+    BACKUP_DIR = os.getenv("BACKUP_DIR", "/var/backups")
+    BACKUP_KEEP = int(os.getenv("BACKUP_KEEP", 14))
+
+    # retention policy applied by `flask retention`:
+    # persons in these membership states for longer than the given days
+    # are deleted (or anonymised if they have registrations / a user)
+    RETENTION_PERSONS = {
+        status.strip(): int(days)
+        for status, _, days in (
+            entry.partition("=")
+            for entry in os.getenv(
+                "RETENTION_PERSONS", "email_unverified=90,denied=365"
+            ).split(",")
+            if entry.strip()
+        )
+    }
+    # registrations of closed events are deleted this many days after
+    # the last registration, set to an empty string to keep them
+    RETENTION_EVENT_DAYS = (
+        int(os.getenv("RETENTION_EVENT_DAYS", 3 * 365))
+        if os.getenv("RETENTION_EVENT_DAYS", "x")
+        else None
+    )
+    RETENTION_BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", 500))
+    # persons per transaction of `flask import-persons` and the admin import
+    IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", 1000))
+    # the admin import runs in the request and has to finish before the
+    # worker timeout, larger files are imported with `flask import-persons`
+    IMPORT_MAX_ROWS = int(os.getenv("IMPORT_MAX_ROWS", 10000))
+
     # who gets a notification when there is a new membership application
     APPROVE_MAIL = os.environ["APPROVE_MAIL"]
     ADMIN_MAIL = os.environ["ADMIN_MAIL"].split(",")
@@ -38,3 +111,36 @@ class Config:
     TOKEN_MAX_AGE = os.environ.get("TOKEN_MAX_AGE", 30 * 60)  # 30 minutes default
 
     LANGUAGES = ["de", "en"]
+
+    # directory for compiled templates, defaults to a directory in /tmp
+    JINJA_CACHE_DIR = os.getenv("JINJA_CACHE_DIR")
+
+    # only store event registrations during requests and process them
+    # in batches using `flask events process-intake`, for opening rushes
+    EVENT_REGISTRATION_INTAKE = (
+        os.getenv("EVENT_REGISTRATION_INTAKE", "").lower() == "true"
+    )
+    INTAKE_BATCH_SIZE = int(os.getenv("INTAKE_BATCH_SIZE", 100))
+
+    # rate limits for public endpoints sending mails, e.g. "5/hour"
+    RATELIMIT_ENABLED = os.getenv("RATELIMIT_ENABLED", "true").lower() == "true"
+    RATELIMIT_PER_IP = os.getenv("RATELIMIT_PER_IP", "20/hour")
+    RATELIMIT_PER_ADDRESS = os.getenv("RATELIMIT_PER_ADDRESS", "5/hour")
+    # sqlite file sharing the limits between the worker processes of a host,
+    # "memory" keeps them per process, only for a single worker
+    RATELIMIT_STORAGE = os.getenv(
+        "RATELIMIT_STORAGE",
+        os.path.join(tempfile.gettempdir(), "memberdb-ratelimit.sqlite"),
+    )
+
+    # participant lists of large events are paginated / exported in chunks
+    PARTICIPANTS_PER_PAGE = int(os.getenv("PARTICIPANTS_PER_PAGE", 100))
+    PARTICIPANTS_MAX_PER_PAGE = int(os.getenv("PARTICIPANTS_MAX_PER_PAGE", 1000))
+    PARTICIPANTS_CSV_CHUNK_SIZE = int(os.getenv("PARTICIPANTS_CSV_CHUNK_SIZE", 500))
+    ARCHIVE_PER_PAGE = int(os.getenv("ARCHIVE_PER_PAGE", 50))
+    # event statistics are cached per worker for at most this many seconds,
+    # changes of registration data by other workers show up after that
+    STATS_CACHE_TTL = int(os.getenv("STATS_CACHE_TTL", 60))
+    STATS_CACHE_SIZE = int(os.getenv("STATS_CACHE_SIZE", 256))
+    # admin list views with count_mode = "estimate" count exactly up to here
+    ADMIN_EXACT_COUNT_LIMIT = int(os.getenv("ADMIN_EXACT_COUNT_LIMIT", 10000))
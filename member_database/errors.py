@@ -1,4 +1,4 @@
-from flask import render_template, url_for, request
+from flask import render_template, url_for, request, make_response
 from flask_login import current_user
 
 from .authentication import LoginForm
@@ -9,6 +9,13 @@ def not_found_error(error):
     return render_template("errors/404.html"), 404
 
 
+def too_many_requests_error(error):
+    response = make_response(render_template("errors/429.html"), 429)
+    if error.retry_after is not None:
+        response.headers["Retry-After"] = str(error.retry_after)
+    return response
+
+
 def internal_error(error):
     db.session.rollback()
     return render_template("errors/500.html"), 500
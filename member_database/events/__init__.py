@@ -1,6 +1,9 @@
 from flask import (
     Blueprint,
+    Response,
     render_template,
+    stream_template,
+    stream_with_context,
     abort,
     flash,
     redirect,
@@ -12,25 +15,46 @@ from flask import (
 from flask_cors import cross_origin
 from flask_login import current_user
 from flask_wtf import FlaskForm
-from flask_mail import Attachment
+from flask_mail import Attachment, Message
 from wtforms.fields import StringField, SubmitField
 from wtforms.validators import DataRequired, Regexp
 from wtforms.fields import EmailField
-from itsdangerous import URLSafeSerializer, BadData
+from itsdangerous import BadData
+from jinja2 import TemplateError
 from flask_babel import _
-from jsonschema import validate, ValidationError
-from sqlalchemy import func
-from sqlalchemy.orm import joinedload
+from sqlalchemy import func, update
+from sqlalchemy.orm import contains_eager, joinedload
 from datetime import datetime, timezone
+import click
+import csv
+import io
 import logging
-
-from ..models import db, Person, as_dict
-from ..utils import get_or_create, ext_url_for
-from ..mail import send_email
+import time
+
+from ..models import db, Person, as_dict, use_replica
+from ..utils import (
+    get_or_create,
+    ext_url_for,
+    background_request_context,
+    retry_on_integrity_error,
+)
+from ..mail import send_email, send_message, send_bulk, merge_environment
 from ..authentication import access_required
-
-from .models import Event, EventRegistration, RegistrationStatus
+from ..ratelimit import rate_limit
+from ..tokens import dumps_token, loads_token, REGISTRATION_SALT
+
+from .models import (
+    Event,
+    EventRegistration,
+    ArchivedEventRegistration,
+    RegistrationStatus,
+    RegistrationIntake,
+    registration_model,
+)
+from .archive import archive_event, restore_event
 from .json_forms import create_wtf_form
+from .data_fields import apply_data_args, create_data_indexes, drop_data_indexes
+from .stats import event_stats, invalidate as invalidate_stats
 from .forms import SendMailForm
 
 
@@ -38,7 +62,9 @@ __all__ = [
     "events",
     "Event",
     "EventRegistration",
+    "ArchivedEventRegistration",
     "RegistrationStatus",
+    "RegistrationIntake",
 ]
 
 log = logging.getLogger(__name__)
@@ -70,16 +96,19 @@ def create_email_field(force_tu_mail=False):
 
 
 @events.before_app_first_request
+@retry_on_integrity_error
 def init_database():
-    for name in ("confirmed", "pending", "waitinglist", "canceled"):
+    for name in RegistrationStatus.STATES:
         get_or_create(RegistrationStatus, name=name)
     db.session.commit()
 
 
 @events.route("/")
+@use_replica
 def index():
     """Index page for the event registration, provides a list with links to
-    the registrations for currently open events"""
+    the registrations for currently open events. Archived events are
+    listed in ``events.archive``."""
     subquery = (
         db.session.query(
             EventRegistration.event_id, func.count("*").label("participants")
@@ -96,6 +125,7 @@ def index():
         Event.registration_open,
         func.coalesce(subquery.c.participants, 0).label("n_participants"),
     ).join(subquery, Event.id == subquery.c.event_id, isouter=True)
+    query = query.filter(Event.archived_at.is_(None))
 
     # for logged in users, we want to show all events, all others
     # only get to see the ones that are currently open
@@ -132,6 +162,129 @@ def get_free_places(event):
     return None
 
 
+# registrations from before timestamps were recorded come last,
+# the backends disagree where they sort NULL
+WAITINGLIST_ORDER = (
+    EventRegistration.timestamp.is_(None),
+    EventRegistration.timestamp,
+    EventRegistration.id,
+)
+
+
+def promote_waitinglist(event, exclude_ids=()):
+    """
+    Move the earliest registrations on the waiting list of ``event``
+    to confirmed, as long as there are free places. Registrations in
+    ``exclude_ids`` were just put on the waiting list and stay there.
+
+    Changes are only added to the current session, so the promotion is
+    part of the transaction that freed the places. The caller is
+    responsible to commit and then send ``send_promotion_mail`` for all
+    returned registrations.
+    """
+    # make sure pending changes, e.g. a canceled registration, are counted
+    db.session.flush()
+
+    query = EventRegistration.query.filter_by(
+        event_id=event.id, status_name="waitinglist"
+    ).order_by(*WAITINGLIST_ORDER)
+    if exclude_ids:
+        query = query.filter(EventRegistration.id.notin_(exclude_ids))
+
+    free_places = get_free_places(event)
+    if free_places is not None:
+        if free_places < 1:
+            return []
+        query = query.limit(free_places)
+
+    promoted = query.all()
+    for registration in promoted:
+        log.info(f"Promoting {registration} from the waiting list")
+        registration.status_name = "confirmed"
+
+    return promoted
+
+
+def set_registration_status(registration_ids, status_name):
+    """
+    Set the status of many registrations with a single UPDATE.
+
+    Like an edit of a single registration, places freed by the change are
+    filled from the waiting list, except by the changed registrations
+    themselves. Changes are only added to the session,
+    the caller has to commit and then send ``send_promotion_mail`` for
+    the returned promoted registrations.
+    Returns the number of changed registrations and the promoted ones.
+    """
+    events = (
+        Event.query.join(EventRegistration)
+        .filter(EventRegistration.id.in_(registration_ids))
+        .distinct()
+        .all()
+    )
+
+    result = db.session.execute(
+        update(EventRegistration)
+        .where(
+            EventRegistration.id.in_(registration_ids),
+            EventRegistration.status_name != status_name,
+        )
+        .values(status_name=status_name)
+        .execution_options(synchronize_session="evaluate")
+    )
+
+    promoted = []
+    for event in events:
+        # the session listener does not see bulk updates
+        invalidate_stats(event.id)
+        promoted.extend(promote_waitinglist(event, registration_ids))
+
+    return result.rowcount, promoted
+
+
+def set_registration_open(event_ids, registration_open):
+    """
+    Open or close the registration of many events with a single UPDATE.
+    Archived events stay closed. Returns the number of changed events.
+    """
+    result = db.session.execute(
+        update(Event)
+        .where(
+            Event.id.in_(event_ids),
+            Event.archived_at.is_(None),
+            Event.registration_open.isnot(registration_open),
+        )
+        .values(registration_open=registration_open)
+        .execution_options(synchronize_session="evaluate")
+    )
+    return result.rowcount
+
+
+def get_waitinglist_position(registration):
+    """Position (starting at 1) of a registration on the waiting list"""
+    if registration.status_name != "waitinglist":
+        return None
+
+    # in the order of WAITINGLIST_ORDER
+    if registration.timestamp is None:
+        before = EventRegistration.timestamp.isnot(None) | (
+            EventRegistration.timestamp.is_(None)
+            & (EventRegistration.id < registration.id)
+        )
+    else:
+        before = (EventRegistration.timestamp < registration.timestamp) | (
+            (EventRegistration.timestamp == registration.timestamp)
+            & (EventRegistration.id < registration.id)
+        )
+
+    ahead = EventRegistration.query.filter(
+        EventRegistration.event_id == registration.event_id,
+        EventRegistration.status_name == "waitinglist",
+        before,
+    ).count()
+    return ahead + 1
+
+
 @events.route("/<int:event_id>/registration/", methods=["GET", "POST"])
 def registration(event_id):
     event = Event.query.filter_by(id=event_id).first_or_404()
@@ -167,12 +320,32 @@ def registration(event_id):
         email = data.pop("email")
         data.pop("csrf_token", None)
 
+        # jsonschema is slow to import, only load it when needed
+        from jsonschema import validate, ValidationError
+
         try:
             validate(data, event.registration_schema)
         except ValidationError as e:
             flash(e.message, "danger")
             return render_template("events/registration.html", form=form, event=event)
 
+        if current_app.config["EVENT_REGISTRATION_INTAKE"]:
+            # only store the submission, process_intake does the rest
+            db.session.add(
+                RegistrationIntake(
+                    event_id=event.id,
+                    email=email,
+                    data=data,
+                    timestamp=datetime.now(timezone.utc),
+                )
+            )
+            db.session.commit()
+            flash(
+                "Deine Anmeldung ist eingegangen. In Kürze bekommst du eine Email mit einem Bestätigungslink. Erst wenn du darauf klickst, bist du angemeldet.",
+                category="success",
+            )
+            return redirect(url_for("events.index"))
+
         person, new_person = get_or_create(
             Person, email=email, defaults={"name": data["name"]}
         )
@@ -228,22 +401,148 @@ def registration(event_id):
     )
 
 
-def send_registration_mail(registration):
-    event = registration.event
-    person = registration.person
-    ts = URLSafeSerializer(
-        current_app.config["SECRET_KEY"],
-        salt="registration-key",
+def process_intake(batch_size=100):
+    """
+    Create persons and registrations for a batch of entries of the
+    registration intake and send the confirmation mails in batches.
+
+    Returns the number of processed entries.
+    """
+    entries = (
+        RegistrationIntake.query.order_by(RegistrationIntake.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+        .all()
     )
-    token = ts.dumps(
-        (person.id, registration.id),
+    if len(entries) == 0:
+        return 0
+
+    emails = {entry.email for entry in entries}
+    persons = {p.email: p for p in Person.query.filter(Person.email.in_(emails))}
+    for entry in entries:
+        if entry.email not in persons:
+            person = Person(email=entry.email, name=entry.data["name"])
+            db.session.add(person)
+            persons[entry.email] = person
+            log.info(f"Created new person {person}")
+    db.session.flush()
+
+    person_ids = [p.id for p in persons.values()]
+    event_ids = {entry.event_id for entry in entries}
+    registrations = {
+        (r.event_id, r.person_id): r
+        for r in EventRegistration.query.filter(
+            EventRegistration.person_id.in_(person_ids),
+            EventRegistration.event_id.in_(event_ids),
+        )
+    }
+
+    to_notify = {}
+    for entry in entries:
+        key = (entry.event_id, persons[entry.email].id)
+        if key not in registrations:
+            registrations[key] = EventRegistration(
+                event_id=entry.event_id,
+                person=persons[entry.email],
+                data=entry.data,
+                status_name="pending",
+            )
+            db.session.add(registrations[key])
+            log.info(f"New registration for E.{key[0]} by {persons[entry.email]}")
+        # existing registrations get their link again
+        to_notify[key] = registrations[key]
+        db.session.delete(entry)
+
+    db.session.commit()
+
+    # one smtp connection per batch of mails, retried if it fails
+    with background_request_context():
+        send_bulk([registration_message(r) for r in to_notify.values()])
+
+    return len(entries)
+
+
+@events.cli.command("process-intake")
+@click.option("--batch-size", type=int, help="Entries per transaction")
+@click.option("--loop", is_flag=True, help="Keep running and poll for new entries")
+@click.option("--interval", default=2.0, help="Seconds between polls with --loop")
+def process_intake_command(batch_size, loop, interval):
+    """Process the registrations received in intake mode"""
+    batch_size = batch_size or current_app.config["INTAKE_BATCH_SIZE"]
+
+    while True:
+        try:
+            n_processed = process_intake(batch_size)
+        except Exception:
+            if not loop:
+                raise
+            log.exception("Processing the registration intake failed")
+            db.session.rollback()
+            n_processed = 0
+
+        if n_processed > 0:
+            log.info(f"Processed {n_processed} registrations from the intake")
+        elif not loop:
+            break
+        else:
+            time.sleep(interval)
+
+
+@events.cli.command("archive")
+@click.argument("event_ids", type=int, nargs=-1, required=True)
+@click.option("--restore", is_flag=True, help="Move the registrations back")
+def archive_command(event_ids, restore):
+    """Move the registrations of closed events to the archive table"""
+    for event_id in event_ids:
+        event = Event.query.get(event_id)
+        if event is None:
+            raise click.BadParameter(f"No event with id {event_id}")
+        n = restore_event(event) if restore else archive_event(event)
+        db.session.commit()
+        click.echo(f"{event}: {'restored' if restore else 'archived'} {n}")
+
+
+@events.cli.command("create-data-indexes")
+def create_data_indexes_command():
+    """Create the sqlite indexes for filtering on registration data fields"""
+    created = set()
+    for event in Event.query:
+        for name in create_data_indexes(event):
+            click.echo(f"{event}: {name}")
+            created.add(name)
+    # e.g. indexes of removed fields or named by an older version
+    for name in drop_data_indexes(created):
+        click.echo(f"dropped {name}")
+    db.session.commit()
+
+
+def registration_token(registration):
+    return dumps_token(
+        (registration.person_id, registration.id),
+        salt=REGISTRATION_SALT,
+        timed=False,
     )
+
+
+def load_registration_token(token):
+    """Return (person_id, registration_id) of a token or abort with 404"""
+    try:
+        return loads_token(token, salt=REGISTRATION_SALT, timed=False)
+    except BadData as e:
+        log.info(f"Invalid registration token: {e}")
+        abort(404)
+
+
+def registration_message(registration):
+    event = registration.event
+    person = registration.person
+    token = registration_token(registration)
     if registration.status_name == "pending":
         subject = "Bestätige deine Anmeldung zu "
     else:
         subject = "Bearbeite deine Anmeldung zu "
 
-    send_email(
+    return Message(
         subject=_(subject) + event.name,
         sender=current_app.config["MAIL_SENDER"],
         recipients=[person.email],
@@ -257,11 +556,62 @@ def send_registration_mail(registration):
     )
 
 
+def send_registration_mail(registration):
+    send_message(registration_message(registration))
+
+
+def send_registration_digest(registrations):
+    """Send a single mail with the links to all given registrations of a person"""
+    person = registrations[0].person
+    links = [
+        (
+            registration,
+            ext_url_for("events.confirmation", token=registration_token(registration)),
+        )
+        for registration in registrations
+    ]
+
+    send_email(
+        subject=_("Deine Veranstaltungsanmeldungen"),
+        sender=current_app.config["MAIL_SENDER"],
+        recipients=[person.email],
+        body=render_template(
+            "events/digest.txt",
+            name=person.name,
+            registrations=links,
+        ),
+    )
+
+
+def send_promotion_mail(registration):
+    """Notify a person that they moved up from the waiting list"""
+    event = registration.event
+    person = registration.person
+    token = registration_token(registration)
+
+    send_email(
+        subject=_("Anmeldung bestätigt: ") + event.name,
+        sender=current_app.config["MAIL_SENDER"],
+        recipients=[person.email],
+        body=render_template(
+            "events/promoted.txt",
+            name=person.name,
+            event=event.name,
+            edit_link=ext_url_for("events.confirmation", token=token),
+        ),
+    )
+
+
 @events.route("/resend_email/", methods=["POST"])
+@rate_limit("resend_email", address_field="email")
 def resend_email():
     registration_id = request.form["registration_id"]
 
     registration = EventRegistration.query.get_or_404(registration_id)
+    # only resend if the caller knows the email of the registration
+    if registration.person.email != request.form.get("email"):
+        abort(404)
+
     send_registration_mail(registration)
     flash("Email versendet", category="success")
 
@@ -269,6 +619,7 @@ def resend_email():
 
 
 @events.route("/resend_emails/", methods=["GET", "POST"])
+@rate_limit("resend_emails", address_field="email")
 def resend_emails():
     """Resend all emails for open events for a given email address"""
 
@@ -280,23 +631,25 @@ def resend_emails():
 
     if form.validate_on_submit():
         email = request.form["email"]
-        person = Person.query.filter_by(email=email).first()
-        if person is None:
-            flash(f'Keine Veranstaltungs-Anmeldung für "{email}"', "danger")
-            return redirect(url_for("events.index"))
-
-        open_registrations = list(
-            EventRegistration.query.filter_by(person=person)
-            .join(Event)
-            .filter_by(registration_open=True)
+        # one query for all open registrations including their events
+        open_registrations = (
+            EventRegistration.query.join(Event)
+            .join(Person)
+            .options(
+                contains_eager(EventRegistration.event),
+                contains_eager(EventRegistration.person).lazyload("*"),
+            )
+            .filter(Person.email == email, Event.registration_open == True)
+            .order_by(Event.id)
+            .all()
         )
 
         if len(open_registrations) == 0:
             flash(f'Keine Veranstaltungs-Anmeldung für "{email}"', "danger")
+            return redirect(url_for("events.index"))
 
-        for registration in open_registrations:
-            send_registration_mail(registration)
-        flash("Emails versendet", category="success")
+        send_registration_digest(open_registrations)
+        flash("Email versendet", category="success")
 
         return redirect(url_for("events.index"))
 
@@ -306,6 +659,7 @@ def resend_emails():
 
 @events.route("/<int:event_id>/")
 @cross_origin(origins=["https://([a-z]+.)?pep-dortmund.(org|de)"])
+@use_replica
 def get_event(event_id):
     event = Event.query.filter_by(id=event_id).first()
     if event is None:
@@ -320,24 +674,65 @@ def get_event(event_id):
     )
 
 
+def participants_query(event_id, model=EventRegistration):
+    """
+    Read-only projection of all registrations for an event.
+
+    Only plain columns are queried, so the result rows are lightweight
+    named tuples that bypass the identity map and change tracking of the ORM.
+    """
+    return (
+        db.session.query(
+            model.id,
+            model.event_id,
+            model.person_id,
+            model.status_name,
+            model.data,
+            model.timestamp,
+            Person.name.label("person_name"),
+            Person.email.label("person_email"),
+        )
+        .join(Person)
+        .filter(model.event_id == event_id)
+        .order_by(model.timestamp.is_(None), model.timestamp, model.id)
+    )
+
+
+def filtered_participants_query(event):
+    """participants_query filtered and sorted by the request's query arguments"""
+    model = registration_model(event)
+    try:
+        return apply_data_args(
+            participants_query(event.id, model), event, request.args, model
+        )
+    except ValueError as e:
+        abort(400, str(e))
+
+
+def schema_columns(event):
+    """The registration data fields of an event, in schema order"""
+    return list(event.registration_schema.get("properties", {}).keys())
+
+
 @events.route("/<int:event_id>/participants/")
 @access_required("get_participants")
+@use_replica
 def participants(event_id):
-    event = Event.query.get(event_id)
-    participants = (
-        EventRegistration.query.options(
-            joinedload(EventRegistration.person)
-        )  # directly fetch persons
-        .filter_by(event_id=event_id)
-        .order_by(EventRegistration.timestamp.is_(None), EventRegistration.timestamp)
-    )
-
-    if "application/json" in request.headers.get("Accept"):
+    """
+    List the registrations of an event as html table or json.
+    Query arguments filter and sort on registration data fields,
+    e.g. ``?degree=Master&chair=E5&sort=-timestamp``.
+    """
+    event = Event.query.get_or_404(event_id)
+    participants = filtered_participants_query(event)
+
+    if "application/json" in request.headers.get("Accept", ""):
         data = []
         for p in participants:
-            d = as_dict(p)
+            d = p._asdict()
             # fill email from person if not present in data
-            d["data"]["email"] = d["data"].get("email", p.person.email)
+            d["data"].setdefault("email", d.pop("person_email"))
+            del d["person_name"]
             data.append(d)
 
         return jsonify(
@@ -345,9 +740,139 @@ def participants(event_id):
             participants=data,
         )
 
-    return render_template(
-        "events/participants.html", participants=participants, event=event
+    page = request.args.get("page", 1, type=int)
+    per_page = min(
+        request.args.get(
+            "per_page", current_app.config["PARTICIPANTS_PER_PAGE"], type=int
+        ),
+        current_app.config["PARTICIPANTS_MAX_PER_PAGE"],
     )
+    pagination = participants.paginate(page=page, per_page=per_page)
+
+    return stream_template(
+        "events/participants.html",
+        participants=pagination,
+        columns=schema_columns(event),
+        event=event,
+    )
+
+
+# spreadsheet programs evaluate cells starting with these as formulas
+CSV_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def csv_cell(value):
+    """Escape user input that a spreadsheet program would run as formula"""
+    if isinstance(value, str) and value.startswith(CSV_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+@events.route("/<int:event_id>/participants.csv")
+@access_required("get_participants")
+@use_replica
+def participants_csv(event_id):
+    """
+    Export all participants of an event as csv file.
+
+    The rows are streamed in chunks, so the full table never has to be
+    held in memory.
+    """
+    event = Event.query.get_or_404(event_id)
+    columns = schema_columns(event)
+    chunk_size = current_app.config["PARTICIPANTS_CSV_CHUNK_SIZE"]
+    query = filtered_participants_query(event)
+
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+
+        # byte order mark, so spreadsheet programs detect utf-8
+        buffer.write("\ufeff")
+        writer.writerow(["#", "name", "email", *columns, "status"])
+
+        for i, p in enumerate(query.yield_per(chunk_size), start=1):
+            row = [
+                p.data.get("name", p.person_name),
+                p.person_email,
+                *(p.data.get(k, "") for k in columns),
+            ]
+            writer.writerow([i, *map(csv_cell, row), p.status_name])
+
+            if i % chunk_size == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+
+        yield buffer.getvalue()
+
+    filename = f"teilnehmende_{event.id}.csv"
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@events.route("/<int:event_id>/stats/")
+@access_required("get_participants")
+@use_replica
+def stats(event_id):
+    """
+    Aggregated registration data, e.g. to plan catering.
+    ``?status=confirmed,waitinglist`` selects the counted registrations,
+    by default only confirmed ones are counted.
+    """
+    event = Event.query.get_or_404(event_id)
+    statuses = {s.strip() for s in request.args.get("status", "confirmed").split(",")}
+    unknown = statuses - set(RegistrationStatus.STATES)
+    if unknown:
+        abort(400, f"Unknown status {', '.join(sorted(unknown))}")
+    return jsonify(status_name="success", stats=event_stats(event, statuses))
+
+
+@events.route("/archive/")
+@access_required("get_participants")
+@use_replica
+def archive():
+    """Paginated history of the archived events, most recent first"""
+    page = request.args.get("page", 1, type=int)
+    pagination = (
+        Event.query.filter(Event.archived_at.isnot(None))
+        .order_by(Event.archived_at.desc(), Event.id.desc())
+        .paginate(page=page, per_page=current_app.config["ARCHIVE_PER_PAGE"])
+    )
+    return render_template("events/archive.html", events=pagination)
+
+
+def merge_messages(event, registrations, subject, body, **kwargs):
+    """
+    Mail merge: one message per registration, the ``body`` template is
+    compiled once and rendered with the data of each registration.
+    Everything is rendered before anything is sent, so an error in the
+    template does not leave a mailing half sent.
+    """
+    template = merge_environment.from_string(body)
+    sender = current_app.config["MAIL_SENDER"]
+
+    return [
+        Message(
+            subject=subject,
+            sender=sender,
+            recipients=[f"{r.person.name} <{r.person.email}>"],
+            body=template.render(
+                name=r.person.name,
+                email=r.person.email,
+                event=event.name,
+                data=r.data,
+                confirmation_link=ext_url_for(
+                    "events.confirmation", token=registration_token(r)
+                ),
+            ),
+            **kwargs,
+        )
+        for r in registrations
+    ]
 
 
 @events.route("/<int:event_id>/write_mail/", methods=["GET", "POST"])
@@ -380,9 +905,33 @@ def write_mail(event_id):
             for f in request.files.getlist(form.attachments.name)
         ]
 
+        reply_to = f"{form.name.data} <{form.email.data}>"
+
+        if form.personalised.data:
+            try:
+                messages = merge_messages(
+                    event,
+                    participants,
+                    subject=form.subject.data,
+                    body=form.body.data,
+                    reply_to=reply_to,
+                    attachments=attachments,
+                )
+            except TemplateError as e:
+                flash(f"Fehler im Template: {e}", "danger")
+                return render_template(
+                    "events/write_mail.html",
+                    event=event,
+                    form=form,
+                    n_participants=n_participants,
+                )
+
+            send_bulk(messages)
+            flash(f"{len(messages)} Mails versendet", "success")
+            return redirect(url_for("events.index"))
+
         # send to everyone in bcc
         bcc = [f"{p.person.name} <{p.person.email}>" for p in participants]
-        reply_to = f"{form.name.data} <{form.email.data}>"
         send_email(
             sender=current_app.config["MAIL_SENDER"],
             subject=form.subject.data,
@@ -403,18 +952,13 @@ def write_mail(event_id):
 
 @events.route("/registration/<token>/", methods=["GET", "POST"])
 def confirmation(token):
-    ts = URLSafeSerializer(
-        current_app.config["SECRET_KEY"],
-        salt="registration-key",
-    )
-    try:
-        person_id, registration_id = ts.loads(token)
-    except BadData as e:
-        print(e)
-        abort(404)
+    person_id, registration_id = load_registration_token(token)
 
     person = Person.query.get(person_id)
     registration = EventRegistration.query.get(registration_id)
+    # archived with its event or deleted by the retention policy
+    if registration is None:
+        return render_template("events/registration_gone.html"), 404
     event = registration.event
     n_participants = EventRegistration.query.filter_by(
         event_id=event.id, status_name="confirmed"
@@ -488,4 +1032,18 @@ def confirmation(token):
         event=registration.event,
         submit_url=url_for("events.confirmation", token=token),
         registration=registration,
+        waitinglist_position=get_waitinglist_position(registration),
+    )
+
+
+@events.route("/registration/<token>/position/")
+def waitinglist_position(token):
+    """Current position of a registration on the waiting list"""
+    _person_id, registration_id = load_registration_token(token)
+    registration = EventRegistration.query.get_or_404(registration_id)
+
+    return jsonify(
+        status_name="success",
+        registration_status=registration.status_name,
+        position=get_waitinglist_position(registration),
     )
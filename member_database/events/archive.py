@@ -0,0 +1,81 @@
+"""
+Archival of past events.
+
+Archiving moves the registrations of a closed event from the hot
+``event_registration`` table, which all queries of the live registration
+use, to ``archived_event_registration``. The number of registrations per
+status is stored on the event, so the history does not need to count the
+archive. Registrations keep their ids and can be moved back by
+:func:`restore_event`.
+
+Both operations are a single ``INSERT ... SELECT`` and ``DELETE`` in the
+transaction of the caller.
+"""
+from datetime import datetime, timezone
+
+from sqlalchemy import delete, func, insert, select
+
+from ..models import db
+from .models import ArchivedEventRegistration, EventRegistration
+
+
+COLUMNS = ("id", "event_id", "person_id", "status_name", "data", "timestamp")
+
+
+def registration_counts(event_id, model=EventRegistration):
+    rows = (
+        db.session.query(model.status_name, func.count(model.id))
+        .filter(model.event_id == event_id)
+        .group_by(model.status_name)
+    )
+    return {status: n for status, n in rows}
+
+
+def move_registrations(event_id, source, target):
+    """Move the registrations of an event from ``source`` to ``target``"""
+    db.session.execute(
+        insert(target.__table__).from_select(
+            COLUMNS,
+            select(*(getattr(source, c) for c in COLUMNS)).where(
+                source.event_id == event_id
+            ),
+        )
+    )
+    result = db.session.execute(
+        delete(source)
+        .where(source.event_id == event_id)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+
+def archive_event(event):
+    """
+    Move the registrations of a closed ``event`` to the archive.
+    Returns the number of moved registrations, the caller has to commit.
+    """
+    if event.registration_open:
+        raise ValueError(f"Registration for {event} is still open")
+    if event.archived_at is not None:
+        raise ValueError(f"{event} is already archived")
+
+    # registrations loaded in this session are about to be deleted
+    db.session.flush()
+    event.registration_counts = registration_counts(event.id)
+    n = move_registrations(event.id, EventRegistration, ArchivedEventRegistration)
+    event.archived_at = datetime.now(timezone.utc)
+    db.session.expire(event, ["registrations", "archived_registrations"])
+    return n
+
+
+def restore_event(event):
+    """Move the registrations of an archived ``event`` back, caller commits"""
+    if event.archived_at is None:
+        raise ValueError(f"{event} is not archived")
+
+    db.session.flush()
+    n = move_registrations(event.id, ArchivedEventRegistration, EventRegistration)
+    event.archived_at = None
+    event.registration_counts = None
+    db.session.expire(event, ["registrations", "archived_registrations"])
+    return n
@@ -0,0 +1,189 @@
+"""
+Filtering and sorting registrations by the fields of their ``data``.
+
+On postgresql, ``data`` is stored as jsonb and equality filters use
+containment (``data @> '{"degree": "Master"}'``), which is served by the
+GIN index created in the migrations.
+
+On sqlite, filters use ``json_extract(data, '$."field"')`` with the path
+rendered literally, so they can use the expression indexes created by
+:func:`create_data_indexes` when an event is saved.
+"""
+import hashlib
+import json
+import re
+
+from sqlalchemy import func, literal_column, text, type_coerce
+from sqlalchemy.dialects.postgresql import JSONB
+
+from ..models import db
+from .models import EventRegistration
+
+
+# indexes on data fields are created at runtime, alembic ignores them
+INDEX_PREFIX = "ix_event_registration_data_"
+
+# query arguments of the participant views that are not data fields
+RESERVED_ARGS = {"page", "per_page", "sort"}
+
+# columns of the registrations that can be used in ``sort``
+COLUMNS = {
+    "timestamp": "timestamp",
+    "status": "status_name",
+    "id": "id",
+}
+
+
+def dialect():
+    return db.session.get_bind().dialect.name
+
+
+def json_path(field):
+    """Literal sql string for the json path of ``field``"""
+    path = "$." + json.dumps(field)
+    return "'" + path.replace("'", "''") + "'"
+
+
+def data_field(field, model=EventRegistration):
+    """
+    Expression for the value of ``field`` in ``model.data``,
+    ``model`` is EventRegistration or ArchivedEventRegistration.
+    """
+    if dialect() == "sqlite":
+        return func.json_extract(model.data, literal_column(json_path(field)))
+    return model.data[field]
+
+
+def data_value(field, schema_type=None, model=EventRegistration):
+    """Scalar sql value of ``field``, for sorting and aggregations"""
+    if dialect() == "sqlite":
+        # json_extract already returns the sql type of the value
+        return data_field(field, model)
+
+    value = model.data[field]
+    if schema_type in ("integer", "number"):
+        return value.as_float()
+    if schema_type == "boolean":
+        return value.as_boolean()
+    return value.as_string()
+
+
+def data_equals(field, value, model=EventRegistration):
+    """Filter condition for registrations with ``data[field] == value``"""
+    if dialect() == "postgresql":
+        return type_coerce(model.data, JSONB).contains({field: value})
+    return data_field(field, model) == value
+
+
+def parse_value(raw, schema_type=None):
+    """Convert a query argument to the type of the schema property"""
+    if schema_type == "integer":
+        return int(raw)
+    if schema_type == "number":
+        return float(raw)
+    if schema_type == "boolean":
+        return raw.lower() in ("true", "1", "yes", "ja")
+    if schema_type == "string":
+        return raw
+
+    # unknown type, e.g. in the admin filters: numbers and booleans as json
+    try:
+        return json.loads(raw)
+    except ValueError:
+        return raw
+
+
+def apply_data_args(query, event, args, model=EventRegistration):
+    """
+    Filter and sort a registration query by the query arguments ``args``.
+
+    Every argument named like a property of the registration schema
+    filters for registrations with that value, multiple values of the same
+    argument are or-ed. ``sort`` takes a comma separated list of
+    properties or columns, a leading ``-`` sorts in descending order.
+    Raises ValueError for invalid values.
+    """
+    properties = event.registration_schema.get("properties", {})
+
+    for field in properties.keys() - RESERVED_ARGS:
+        # empty values come from the "all" option of the filter form
+        values = [value for value in args.getlist(field) if value != ""]
+        if not values:
+            continue
+        schema_type = properties[field].get("type")
+        values = [parse_value(value, schema_type) for value in values]
+        query = query.filter(db.or_(*(data_equals(field, v, model) for v in values)))
+
+    sort = args.get("sort")
+    if sort:
+        order_by = []
+        for key in sort.split(","):
+            key = key.strip()
+            descending = key.startswith("-")
+            key = key.lstrip("-")
+
+            if key in properties:
+                column = data_value(key, properties[key].get("type"), model)
+            elif key in COLUMNS:
+                column = getattr(model, COLUMNS[key])
+            else:
+                raise ValueError(f"Cannot sort by unknown field {key!r}")
+
+            order_by.append(column.desc() if descending else column)
+        query = query.order_by(None).order_by(*order_by, model.id)
+
+    return query
+
+
+def index_name(field):
+    # the hash keeps e.g. "Degree" and "degree" or "e-mail" and "e_mail" apart
+    digest = hashlib.sha1(field.encode("utf-8")).hexdigest()[:8]
+    return INDEX_PREFIX + re.sub(r"[^a-z0-9_]", "_", field.lower()) + "_" + digest
+
+
+def create_data_indexes(event):
+    """
+    Create expression indexes for the scalar properties of an event on sqlite.
+
+    Indexes are per field name and shared between events.
+    On postgresql, the GIN index on ``data`` covers all fields.
+    """
+    if dialect() != "sqlite":
+        return []
+
+    properties = event.registration_schema.get("properties", {})
+    created = []
+    for field, prop in properties.items():
+        if prop.get("type") in ("object", "array"):
+            continue
+
+        name = index_name(field)
+        db.session.execute(
+            text(
+                f'CREATE INDEX IF NOT EXISTS "{name}" ON event_registration'
+                f" (event_id, json_extract(data, {json_path(field)}))"
+            )
+        )
+        created.append(name)
+    return created
+
+
+def drop_data_indexes(keep):
+    """
+    Drop the data field indexes on sqlite that are not in ``keep``,
+    e.g. of fields no event uses anymore. Returns the dropped names.
+    """
+    if dialect() != "sqlite":
+        return []
+
+    names = db.session.execute(
+        text(
+            "SELECT name FROM sqlite_master WHERE type = 'index'"
+            " AND tbl_name = 'event_registration' AND substr(name, 1, :n) = :prefix"
+        ),
+        {"n": len(INDEX_PREFIX), "prefix": INDEX_PREFIX},
+    ).scalars()
+    dropped = [name for name in names if name not in keep]
+    for name in dropped:
+        db.session.execute(text(f'DROP INDEX "{name}"'))
+    return dropped
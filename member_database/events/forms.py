@@ -2,17 +2,44 @@ from flask_wtf import FlaskForm
 
 # from flask_wtf.file import FileField, FileRequired
 
+from jinja2 import TemplateSyntaxError
 from wtforms.fields import EmailField
-from wtforms import StringField, TextAreaField, SubmitField, MultipleFileField
+from wtforms import (
+    BooleanField,
+    StringField,
+    TextAreaField,
+    SubmitField,
+    MultipleFileField,
+    ValidationError,
+)
 from wtforms.validators import DataRequired
 
+from ..mail import merge_environment
+
+
+def valid_merge_template(form, field):
+    if not form.personalised.data:
+        return
+    try:
+        merge_environment.parse(field.data)
+    except TemplateSyntaxError as e:
+        raise ValidationError(f"Fehler im Template in Zeile {e.lineno}: {e.message}")
+
 
 class SendMailForm(FlaskForm):
     name = StringField("Name", validators=[DataRequired()])
     email = EmailField("Email", validators=[DataRequired()])
 
     subject = StringField("Subject", validators=[DataRequired()])
-    body = TextAreaField("Inhalt", validators=[DataRequired()])
+    body = TextAreaField("Inhalt", validators=[DataRequired(), valid_merge_template])
+    personalised = BooleanField(
+        "Persönliche Mail an jede*n Teilnehmer*in",
+        description=(
+            "Der Inhalt ist dann ein Jinja-Template mit den Variablen"
+            " {{ name }}, {{ email }}, {{ event }}, {{ confirmation_link }}"
+            " und den Anmeldedaten in {{ data }}, z. B. {{ data.essen }}."
+        ),
+    )
 
     attachments = MultipleFileField("Anhänge")
     submit = SubmitField("Email senden")
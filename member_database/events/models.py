@@ -1,6 +1,6 @@
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.mutable import MutableDict
 from sqlalchemy.orm import validates
-from jsonschema.validators import Draft7Validator
 
 from ..models import db
 
@@ -17,8 +17,16 @@ class Event(db.Model):
     registration_open = db.Column(db.Boolean, default=False)
     registration_schema = db.Column(MutableDict.as_mutable(db.JSON), nullable=False)
 
+    # archived events keep their registrations in ArchivedEventRegistration
+    # and the number of registrations per status at the time of archival
+    archived_at = db.Column(db.DateTime(timezone=True), index=True)
+    registration_counts = db.Column(db.JSON)
+
     @validates("registration_schema")
     def validate_schema(self, key, schema):
+        # jsonschema is slow to import, only load it when needed
+        from jsonschema.validators import Draft7Validator
+
         Draft7Validator.check_schema(schema)
         return schema
 
@@ -44,17 +52,87 @@ class EventRegistration(db.Model):
         "RegistrationStatus", backref=db.backref("event_registrations", lazy=True)
     )
 
-    data = db.Column(MutableDict.as_mutable(db.JSON))
+    # jsonb on postgresql, so filters on data fields can use a GIN index
+    data = db.Column(
+        MutableDict.as_mutable(db.JSON().with_variant(JSONB, "postgresql"))
+    )
     timestamp = db.Column(db.DateTime(timezone=True))
 
     __table_args__ = (
         # a person can only register once for an event
         db.UniqueConstraint("event_id", "person_id", name="unique_person_event"),
+        # find the next registrations on the waiting list / count seats
+        db.Index(
+            "ix_event_registration_event_status_timestamp",
+            "event_id",
+            "status_name",
+            "timestamp",
+        ),
     )
 
     def __repr__(self):
         return f"<EReg {self.id}: P.{self.person_id} for E.{self.event_id}>"
 
 
+class ArchivedEventRegistration(db.Model):
+    """
+    Registrations of archived events, moved out of ``event_registration``
+    so the queries of the live registration don't have to skip them.
+    Columns and ids are the same as in ``EventRegistration``.
+    """
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    event_id = db.Column(
+        db.Integer, db.ForeignKey("event.id"), nullable=False, index=True
+    )
+    event = db.relationship(
+        "Event", backref=db.backref("archived_registrations", lazy=True)
+    )
+
+    person_id = db.Column(
+        db.Integer, db.ForeignKey("person.id"), nullable=False, index=True
+    )
+    person = db.relationship(
+        "Person", backref=db.backref("archived_event_registrations", lazy=True)
+    )
+
+    status_name = db.Column(
+        db.String, db.ForeignKey("registration_status.name"), nullable=False
+    )
+    data = db.Column(
+        MutableDict.as_mutable(db.JSON().with_variant(JSONB, "postgresql"))
+    )
+    timestamp = db.Column(db.DateTime(timezone=True))
+
+    def __repr__(self):
+        return f"<ArchivedEReg {self.id}: P.{self.person_id} for E.{self.event_id}>"
+
+
+def registration_model(event):
+    """The model holding the registrations of ``event``"""
+    if event.archived_at is not None:
+        return ArchivedEventRegistration
+    return EventRegistration
+
+
+class RegistrationIntake(db.Model):
+    """
+    Validated registration submissions, that still need to be turned into
+    persons and registrations, see ``events.process_intake``.
+    """
+
+    id = db.Column(db.Integer, primary_key=True)
+    event_id = db.Column(db.Integer, db.ForeignKey("event.id"), nullable=False)
+    email = db.Column(db.String(120), nullable=False)
+    data = db.Column(db.JSON, nullable=False)
+    timestamp = db.Column(db.DateTime(timezone=True))
+
+    def __repr__(self):
+        return f"<Intake {self.id}: {self.email} for E.{self.event_id}>"
+
+
 class RegistrationStatus(db.Model):
     name = db.Column(db.String, primary_key=True)
+
+    STATES = ("confirmed", "pending", "waitinglist", "canceled")
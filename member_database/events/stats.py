@@ -0,0 +1,218 @@
+"""
+Aggregated statistics of the registration data of an event.
+
+The aggregations are derived from the registration schema and run in sql:
+counts per value for strings and enums, sums and histograms for numbers
+and true / false counts for booleans, plus the registrations per hour.
+
+Results are cached per worker process, in an LRU of ``STATS_CACHE_SIZE``
+entries, until the registrations of the event change. Changes by this
+process are noticed by a session listener. New, deleted and moved
+registrations of other processes are noticed by a cheap fingerprint query
+(count and highest id per status), which only uses the registration index.
+Edits of the registration data by other processes are not visible in the
+fingerprint, so results are recomputed after ``STATS_CACHE_TTL`` seconds.
+"""
+from collections import OrderedDict
+from threading import Lock
+import time
+
+from flask import current_app
+from sqlalchemy import Integer, cast, event as sa_event, func
+from sqlalchemy.orm import Session
+
+from ..models import db
+from .data_fields import data_value, dialect
+from .models import Event, EventRegistration, registration_model
+
+
+HISTOGRAM_BINS = 10
+
+_cache = OrderedDict()
+_cache_lock = Lock()
+
+
+def fingerprint(event_id, model=EventRegistration):
+    rows = (
+        db.session.query(
+            model.status_name,
+            func.count(model.id),
+            func.max(model.id),
+        )
+        .filter(model.event_id == event_id)
+        .group_by(model.status_name)
+        .all()
+    )
+    return tuple(sorted(tuple(row) for row in rows))
+
+
+def registrations(event_id, statuses, model=EventRegistration):
+    return db.session.query(model).filter(
+        model.event_id == event_id,
+        model.status_name.in_(statuses),
+    )
+
+
+def value_counts(query, value):
+    rows = (
+        query.with_entities(value, func.count())
+        .filter(value.isnot(None))
+        .group_by(value)
+        .order_by(func.count().desc(), value)
+    )
+    return {value: n for value, n in rows}
+
+
+def number_stats(query, value, schema_type):
+    n, total, minimum, maximum = query.with_entities(
+        func.count(value), func.sum(value), func.min(value), func.max(value)
+    ).one()
+    if schema_type == "integer" and n > 0:
+        total, minimum, maximum = int(total), int(minimum), int(maximum)
+
+    stats = {
+        "count": n,
+        "sum": total,
+        "mean": total / n if n > 0 else None,
+        "min": minimum,
+        "max": maximum,
+    }
+
+    if n == 0:
+        stats["histogram"] = []
+    elif schema_type == "integer" and maximum - minimum < 2 * HISTOGRAM_BINS:
+        # few distinct values, e.g. number of guests: count every value
+        counts = value_counts(query, value)
+        stats["histogram"] = [
+            {"value": int(v), "count": counts[v]} for v in sorted(counts)
+        ]
+    else:
+        width = (maximum - minimum) / HISTOGRAM_BINS or 1
+        # values equal to the maximum go into the last bin
+        if dialect() == "sqlite":
+            # sqlite's floor is optional, casting truncates
+            bin_ = func.min(
+                cast((value - minimum) / width, Integer), HISTOGRAM_BINS - 1
+            )
+        else:
+            bin_ = func.least(func.floor((value - minimum) / width), HISTOGRAM_BINS - 1)
+        counts = value_counts(query, bin_)
+        stats["histogram"] = [
+            {
+                "from": minimum + i * width,
+                "to": minimum + (i + 1) * width,
+                "count": counts.get(i, 0),
+            }
+            for i in range(HISTOGRAM_BINS)
+        ]
+    return stats
+
+
+def boolean_stats(query, value):
+    counts = value_counts(query, value)
+    n_true = sum(n for v, n in counts.items() if v)
+    n_false = sum(n for v, n in counts.items() if not v)
+    total = n_true + n_false
+    return {
+        "true": n_true,
+        "false": n_false,
+        "ratio": n_true / total if total > 0 else None,
+    }
+
+
+def field_stats(query, prop, field, model=EventRegistration):
+    schema_type = prop.get("type")
+    value = data_value(field, schema_type, model)
+
+    if schema_type in ("integer", "number"):
+        return {"type": "number", **number_stats(query, value, schema_type)}
+    if schema_type == "boolean":
+        return {"type": "boolean", **boolean_stats(query, value)}
+    if schema_type == "string" or "enum" in prop:
+        counts = value_counts(query, value)
+        # also list the options nobody chose
+        for option in prop.get("enum", []):
+            counts.setdefault(option, 0)
+        return {"type": "counts", "counts": counts}
+    return None
+
+
+def timeline(query, model=EventRegistration):
+    """Registrations per hour, in utc"""
+    if dialect() == "sqlite":
+        hour = func.strftime("%Y-%m-%dT%H:00:00+00:00", model.timestamp)
+    else:
+        hour = func.to_char(
+            func.date_trunc("hour", func.timezone("UTC", model.timestamp)),
+            'YYYY-MM-DD"T"HH24:00:00+00:00',
+        )
+
+    rows = (
+        query.with_entities(hour, func.count())
+        .filter(model.timestamp.isnot(None))
+        .group_by(hour)
+        .order_by(hour)
+    )
+    return [{"hour": hour, "registrations": n} for hour, n in rows]
+
+
+def compute_stats(event, statuses):
+    model = registration_model(event)
+    query = registrations(event.id, statuses, model)
+    properties = event.registration_schema.get("properties", {})
+
+    fields = {}
+    for field, prop in properties.items():
+        stats = field_stats(query, prop, field, model)
+        if stats is not None:
+            fields[field] = stats
+
+    return {
+        "registrations": query.count(),
+        "fields": fields,
+        "timeline": timeline(query, model),
+    }
+
+
+def event_stats(event, statuses):
+    """Statistics of the registrations of ``event`` with one of ``statuses``"""
+    key = (event.id, tuple(sorted(set(statuses))))
+    current = fingerprint(event.id, registration_model(event))
+    now = time.monotonic()
+
+    with _cache_lock:
+        cached = _cache.get(key)
+    if cached is not None:
+        cached_fingerprint, computed_at, stats = cached
+        if (
+            cached_fingerprint == current
+            and now - computed_at < current_app.config["STATS_CACHE_TTL"]
+        ):
+            with _cache_lock:
+                if key in _cache:
+                    _cache.move_to_end(key)
+            return stats
+
+    stats = compute_stats(event, key[1])
+    with _cache_lock:
+        _cache[key] = (current, now, stats)
+        _cache.move_to_end(key)
+        while len(_cache) > current_app.config["STATS_CACHE_SIZE"]:
+            _cache.popitem(last=False)
+    return stats
+
+
+def invalidate(event_id):
+    with _cache_lock:
+        for key in [key for key in _cache if key[0] == event_id]:
+            del _cache[key]
+
+
+@sa_event.listens_for(Session, "after_flush")
+def invalidate_changed(session, flush_context):
+    """Forget the statistics of events whose registrations or schema changed"""
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, EventRegistration):
+            invalidate(obj.event_id)
+        elif isinstance(obj, Event):
+            invalidate(obj.id)
@@ -1,12 +1,24 @@
+import csv
 from datetime import date
+import io
+from itertools import islice
 
+from flask import current_app
 from flask_wtf import FlaskForm
+from flask_wtf.file import FileAllowed, FileField, FileRequired
 from flask_babel import lazy_gettext as _l
-from wtforms import StringField, SubmitField, ValidationError, RadioField
+from wtforms import (
+    BooleanField,
+    RadioField,
+    SelectField,
+    StringField,
+    SubmitField,
+    ValidationError,
+)
 from wtforms.fields import EmailField, DateField
 from wtforms.validators import DataRequired, Email, Optional
 
-from .models import Person, MembershipType
+from .models import Person, MembershipStatus, MembershipType
 
 
 def known_email(form, field):
@@ -15,6 +27,26 @@ def known_email(form, field):
         raise ValidationError("Unbekannte Email-Adresse")
 
 
+def max_import_rows(form, field):
+    max_rows = current_app.config["IMPORT_MAX_ROWS"]
+    stream = field.data.stream
+    lines = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    try:
+        # the header and one row more than allowed is enough to know
+        rows = sum(1 for _ in islice(csv.reader(lines), max_rows + 2)) - 1
+    except UnicodeDecodeError:
+        raise ValidationError("Die Datei ist nicht UTF-8-kodiert")
+    finally:
+        lines.detach()
+        stream.seek(0)
+
+    if rows > max_rows:
+        raise ValidationError(
+            f"Höchstens {max_rows} Zeilen, größere Dateien bitte mit"
+            " `flask import-persons` importieren"
+        )
+
+
 def not_in_future(form, field):
     if field.data > date.today():
         raise ValidationError("Datum darf nicht in der Zukunft liegen")
@@ -71,3 +103,20 @@ class RequestLinkForm(FlaskForm):
         _l("E-Mail-Adresse"), validators=[DataRequired(), Email(), known_email]
     )
     submit = SubmitField()
+
+
+class PersonImportForm(FlaskForm):
+    file = FileField(
+        _l("CSV-Datei"),
+        validators=[
+            FileRequired(),
+            FileAllowed(["csv"], "Nur CSV-Dateien"),
+            max_import_rows,
+        ],
+    )
+    membership_status = SelectField(
+        _l("Mitgliedschaftsstatus für Zeilen ohne Status"),
+        choices=[("", "unverändert")] + [(s, s) for s in MembershipStatus.STATES],
+        default="",
+    )
+    dry_run = BooleanField(_l("Nur prüfen, nichts speichern"))
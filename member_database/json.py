@@ -1,12 +1,65 @@
-from flask.json import JSONEncoder
+"""
+JSON encoding used for flask responses and the JSON database columns.
+
+Uses orjson if it is installed (``pip install orjson``), which is much
+faster for large payloads like the participant lists, and the stdlib
+json module otherwise. Both encode dates and datetimes as ISO8601 and
+Decimals (from the html5 decimal input fields) as floats.
+"""
 from datetime import date
+from decimal import Decimal
+import json
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def default(obj):
+    if isinstance(obj, Decimal):
+        return float(obj)
+
+    if isinstance(obj, date):
+        return obj.isoformat()
+
+    if hasattr(obj, "__html__"):
+        return str(obj.__html__())
+
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj, sort_keys=False, indent=None, **kwargs):
+    """Serialize ``obj`` to a json string"""
+    # orjson only supports a subset of the options of json.dumps
+    if orjson is None or kwargs.keys() - {"default", "ensure_ascii", "separators"}:
+        kwargs.setdefault("default", default)
+        return json.dumps(obj, sort_keys=sort_keys, indent=indent, **kwargs)
+
+    option = orjson.OPT_NON_STR_KEYS
+    if sort_keys:
+        option |= orjson.OPT_SORT_KEYS
+    if indent:
+        option |= orjson.OPT_INDENT_2
+    return orjson.dumps(obj, default=default, option=option).decode()
+
+
+def loads(s, **kwargs):
+    if orjson is None or kwargs:
+        return json.loads(s, **kwargs)
+    return orjson.loads(s)
+
 
+class JSONProvider(DefaultJSONProvider):
+    """Flask json provider using :func:`dumps` and :func:`loads`"""
 
-class JSONEncoderISO8601(JSONEncoder):
-    """A JSONEnCoder that encodes dates using ISO8601 instead of rfc 2616"""
+    sort_keys = False
 
-    def default(self, obj):
-        if isinstance(obj, date):
-            return obj.isoformat()
+    def dumps(self, obj, **kwargs):
+        kwargs.setdefault("sort_keys", self.sort_keys)
+        return dumps(obj, **kwargs)
 
-        return super().default(obj)
+    def loads(self, s, **kwargs):
+        return loads(s, **kwargs)
@@ -1,15 +1,51 @@
+from collections import deque
 from flask import current_app
-from flask_mail import Mail, Message
+from flask_mail import Mail, Message, Connection
+from jinja2.sandbox import SandboxedEnvironment
 from threading import Thread
-import socket
+import smtplib
 import logging
 import backoff
 
 
 log = logging.getLogger(__name__)
 
-socket.setdefaulttimeout(30)
-mail = Mail()
+
+class TimeoutConnection(Connection):
+    """
+    Connection to the smtp server with a timeout.
+
+    Only applies to the smtp sockets, so unlike ``socket.setdefaulttimeout``
+    it does not affect database connections or the workers of gunicorn.
+    """
+
+    def configure_host(self):
+        timeout = current_app.config["MAIL_TIMEOUT"]
+        if self.mail.use_ssl:
+            host = smtplib.SMTP_SSL(self.mail.server, self.mail.port, timeout=timeout)
+        else:
+            host = smtplib.SMTP(self.mail.server, self.mail.port, timeout=timeout)
+
+        host.set_debuglevel(int(self.mail.debug))
+
+        if self.mail.use_tls:
+            host.starttls()
+        if self.mail.username and self.mail.password:
+            host.login(self.mail.username, self.mail.password)
+
+        return host
+
+
+class TimeoutMail(Mail):
+    def connect(self):
+        app = getattr(self, "app", None) or current_app
+        return TimeoutConnection(app.extensions["mail"])
+
+
+mail = TimeoutMail()
+
+# templates written by users, e.g. the body of a mail merge
+merge_environment = SandboxedEnvironment(keep_trailing_newline=True)
 
 
 def on_backoff(details):
@@ -20,14 +56,32 @@ def on_backoff(details):
     )
 
 
-@backoff.on_exception(
+def is_permanent(e):
+    """
+    Errors the smtp server answered with, e.g. refused recipients or a
+    failed login, do not go away by trying again. The smtp exceptions are
+    subclasses of OSError, only lost connections and temporary 4xx replies
+    are retried.
+    """
+    if isinstance(e, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)):
+        return False
+    if isinstance(e, smtplib.SMTPResponseException):
+        return e.smtp_code >= 500
+    return isinstance(e, smtplib.SMTPException)
+
+
+retry = backoff.on_exception(
     backoff.expo,
     (ConnectionError, OSError),  # all socket exceptions are subclasses of OSError
+    giveup=is_permanent,
     max_tries=12,  # max waiting time: 1.4 days
     on_backoff=on_backoff,
     base=2,  # double waiting time after each try
     factor=30,  # 30, 60, 120 ... seconds
 )
+
+
+@retry
 def target(app, msg):
     log.info(f'Sending mail with subject "{msg.subject}" to {msg.recipients}')
     with app.app_context():
@@ -49,7 +103,11 @@ def send_msg_async(msg):
     """
     # See https://blog.miguelgrinberg.com/post/the-flask-mega-tutorial-part-xv-a-better-application-structure
     # For an explanation of the current_app magic
-    Thread(target=target, args=(current_app._get_current_object(), msg)).start()
+    Thread(
+        target=target,
+        args=(current_app._get_current_object(), msg),
+        name="send-mail",
+    ).start()
 
 
 def send_email(subject, sender, recipients, body, **kwargs):
@@ -58,12 +116,78 @@ def send_email(subject, sender, recipients, body, **kwargs):
     """
     msg = Message(subject=subject, sender=sender, recipients=recipients, **kwargs)
     msg.body = body
+    send_message(msg)
 
+
+def send_message(msg):
+    """
+    Send a message async using a background thread
+    """
     # capturing mails does not work in another thread
     # so just send it here for the unit tests
     if current_app.config["TESTING"]:
         mail.send(msg)
     elif current_app.config["DEBUG"] is True:
-        print(body)
+        print(msg.body)
     else:
         send_msg_async(msg)
+
+
+@retry
+def send_batch(messages):
+    """
+    Send a deque of messages over a single smtp connection.
+    Sent messages are removed, so a retry continues with the rest.
+    Messages refused by the server are logged and skipped.
+    """
+    with mail.connect() as connection:
+        while messages:
+            msg = messages[0]
+            try:
+                connection.send(msg)
+            except (smtplib.SMTPRecipientsRefused, smtplib.SMTPDataError):
+                log.exception(
+                    f'Failed sending mail with subject "{msg.subject}"'
+                    f" to {msg.recipients}, skipping it"
+                )
+            messages.popleft()
+
+
+def send_batches(messages):
+    batch_size = current_app.config["MAIL_BATCH_SIZE"]
+    for start in range(0, len(messages), batch_size):
+        batch = deque(messages[start : start + batch_size])
+        log.info(f'Sending {len(batch)} mails with subject "{batch[0].subject}"')
+        try:
+            send_batch(batch)
+        except Exception:
+            log.exception(f"Failed sending {len(batch)} mails, giving up")
+            raise
+    log.info(f"Sent {len(messages)} mails")
+
+
+def send_batches_in_context(app, messages):
+    with app.app_context():
+        send_batches(messages)
+
+
+def send_bulk(messages):
+    """
+    Send many messages, e.g. of a mail merge, in a single background thread.
+    Every batch of ``MAIL_BATCH_SIZE`` messages uses one smtp connection
+    instead of one connection and thread per message.
+    """
+    if not messages:
+        return
+
+    if current_app.config["TESTING"]:
+        send_batches(messages)
+    elif current_app.config["DEBUG"] is True:
+        for msg in messages:
+            print(msg.recipients, msg.body)
+    else:
+        Thread(
+            target=send_batches_in_context,
+            args=(current_app._get_current_object(), messages),
+            name="send-bulk-mail",
+        ).start()
@@ -1,4 +1,5 @@
-from datetime import date
+from datetime import date, datetime, timezone
+from itertools import chain
 from flask import (
     jsonify,
     request,
@@ -8,32 +9,44 @@ from flask import (
     flash,
     abort,
     Blueprint,
+    Response,
     current_app,
 )
 from flask_login import current_user, login_user, logout_user
 from flask_babel import _
-from itsdangerous import URLSafeTimedSerializer, SignatureExpired, BadData
+from itsdangerous import SignatureExpired, BadData
 
+from sqlalchemy import update
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload, lazyload, selectinload
 
 from .models import (
     db,
     Person,
     as_dict,
+    column_query,
+    use_replica,
     MembershipStatus,
     MembershipType,
     TUStatus,
+    search_filter,
 )
-from .utils import get_or_create, ext_url_for
+from .events.models import EventRegistration, ArchivedEventRegistration
+from .json import dumps
+from .utils import get_or_create, ext_url_for, retry_on_integrity_error
 from .authentication import access_required
 from .forms import PersonEditForm, MembershipForm, RequestLinkForm
 from .mail import send_email
+from .metrics import metrics
+from .ratelimit import rate_limit
+from .tokens import dumps_token, loads_token, EDIT_SALT, GDPR_DATA_SALT
 
 
 main = Blueprint("main", __name__)
 
 
 @main.before_app_first_request
+@retry_on_integrity_error
 def init_database():
     for id_ in MembershipStatus.STATES:
         get_or_create(MembershipStatus, id=id_)
@@ -54,8 +67,9 @@ def index():
 
 @main.route("/persons", methods=["GET"])
 @access_required("get_persons")
+@use_replica
 def get_persons():
-    persons = [as_dict(person) for person in Person.query.all()]
+    persons = [row._asdict() for row in column_query(Person)]
     return jsonify(status="success", persons=persons)
 
 
@@ -93,16 +107,18 @@ def add_person():
 
 @main.route("/members/", methods=["GET"])
 @access_required("get_members")
+@use_replica
 def get_members():
     """Return a json list with all current members"""
-    members = Person.query.filter_by(
-        membership_status_id=MembershipStatus.CONFIRMED
-    ).all()
-    members = [as_dict(member) for member in members]
+    members = column_query(Person).filter(
+        Person.membership_status_id == MembershipStatus.CONFIRMED
+    )
+    members = [row._asdict() for row in members]
     return jsonify(status="success", members=members)
 
 
 @main.route("/register/", methods=["GET", "POST"])
+@rate_limit("register", address_field="email")
 def register():
     """
     Endpoint for membership registration.
@@ -157,8 +173,7 @@ def register():
         db.session.add(p)
         db.session.commit()
 
-        ts = URLSafeTimedSerializer(current_app.config["SECRET_KEY"])
-        token = ts.dumps(p.email, salt="edit-key")
+        token = dumps_token(p.email, salt=EDIT_SALT)
 
         send_email(
             subject=_("PeP et al. Mitgliedsantrag: Email bestätigen"),
@@ -184,6 +199,7 @@ def register():
 
 
 @main.route("/request_edit", methods=["POST", "GET"])
+@rate_limit("request_edit", address_field="email")
 def request_edit():
     """
     Request a link to edit personal data
@@ -191,8 +207,7 @@ def request_edit():
     form = RequestLinkForm()
 
     if form.validate_on_submit():
-        ts = URLSafeTimedSerializer(current_app.config["SECRET_KEY"])
-        token = ts.dumps(form.email.data, salt="edit-key")
+        token = dumps_token(form.email.data, salt=EDIT_SALT)
 
         send_email(
             subject=_("PeP et al. e.V. Mitgliedsdatenänderung"),
@@ -214,6 +229,7 @@ def request_edit():
 
 
 @main.route("/request_gdpr_data", methods=["POST", "GET"])
+@rate_limit("request_gdpr_data", address_field="email")
 def request_gdpr_data():
     """
     Request a link to view personal data
@@ -221,8 +237,7 @@ def request_gdpr_data():
     form = RequestLinkForm()
 
     if form.validate_on_submit():
-        ts = URLSafeTimedSerializer(current_app.config["SECRET_KEY"])
-        token = ts.dumps(form.email.data, salt="request_gdpr_data-key")
+        token = dumps_token(form.email.data, salt=GDPR_DATA_SALT)
 
         send_email(
             subject="PeP et al. e.V. - Einsicht in gespeicherte Daten",
@@ -246,10 +261,9 @@ def request_gdpr_data():
 @main.route("/edit/<token>", methods=["GET", "POST"])
 def edit(token):
     try:
-        ts = URLSafeTimedSerializer(current_app.config["SECRET_KEY"])
-        email = ts.loads(
+        email = loads_token(
             token,
-            salt="edit-key",
+            salt=EDIT_SALT,
             max_age=current_app.config["TOKEN_MAX_AGE"],
         )
     except SignatureExpired:
@@ -325,34 +339,115 @@ def edit(token):
 @main.route("/view_data/<token>")
 def view_data(token):
     try:
-        ts = URLSafeTimedSerializer(current_app.config["SECRET_KEY"])
-        email = ts.loads(token, salt="request_gdpr_data-key")
+        email = loads_token(token, salt=GDPR_DATA_SALT)
     except SignatureExpired:
         flash(_("Ihre Sitzung ist abgelaufen"))
     except BadData:
         abort(404)
 
-    p = Person.query.filter_by(email=email).first()
+    # live and archived registrations in one query each, joining both
+    # collections in a single query would return their cartesian product.
+    # The events are contained only once in the export
+    person = (
+        Person.query.options(
+            joinedload(Person.event_registrations).joinedload(EventRegistration.event),
+            selectinload(Person.archived_event_registrations).joinedload(
+                ArchivedEventRegistration.event
+            ),
+            lazyload(Person.membership_status),
+            lazyload(Person.membership_type),
+            lazyload(Person.tu_status),
+        )
+        .filter_by(email=email)
+        .first()
+    )
 
-    if p is None:
+    if person is None:
         abort(404)
 
-    personal_data = as_dict(p)
-    personal_data["event_registrations"] = []
+    def generate():
+        personal_data = dumps(as_dict(person))
+        yield '{"status": "success", "personal_data": '
+        yield personal_data[:-1] + ', "event_registrations": ['
 
-    for reg in p.event_registrations:
-        personal_data["event_registrations"].append(
-            {"event": as_dict(reg.event), "registration": as_dict(reg)}
+        events = {}
+        registrations = chain(
+            person.event_registrations, person.archived_event_registrations
         )
+        for i, registration in enumerate(registrations):
+            events.setdefault(registration.event_id, registration.event)
+            yield ("," if i > 0 else "") + dumps(as_dict(registration))
+
+        yield ']}, "events": ['
+        yield ",".join(dumps(as_dict(event)) for event in events.values())
+        yield "]}\n"
+
+    return Response(generate(), mimetype="application/json")
 
-    return jsonify(status="success", personal_data=personal_data)
+
+@main.route("/metrics")
+@access_required("view_metrics")
+def get_metrics():
+    """Counters of this worker process, e.g. for rate limiting"""
+    return jsonify(status="success", metrics=metrics.snapshot())
 
 
 @main.route("/applications")
 @access_required("member_management")
 def applications():
-    applications = Person.query.filter_by(membership_status_id="pending").all()
-    return render_template("applications.html", applications=applications)
+    """Open applications, ``?q=`` searches by name or email"""
+    applications = Person.query.filter_by(membership_status_id="pending")
+    search = request.args.get("q", "").strip()
+    if search:
+        applications = applications.filter(search_filter(Person.id, search))
+    return render_template(
+        "applications.html", applications=applications.all(), search=search
+    )
+
+
+def send_welcome_mail(new_member):
+    send_email(
+        subject=_("Willkommen bei PeP et al. e.V."),
+        sender=current_app.config["MAIL_SENDER"],
+        recipients=[new_member.email],
+        body=render_template(
+            "mail/welcome.txt",
+            new_member=new_member,
+        ),
+    )
+
+
+def set_membership_status(person_ids, status):
+    """
+    Set the membership status of many persons with a single UPDATE.
+
+    Keeps ``status_changed_at`` up to date for the retention policy and,
+    for newly confirmed members, the joining date. Changes are only added
+    to the session. Returns the number of changed persons and the newly
+    confirmed ones, who should get ``send_welcome_mail`` after the commit.
+    """
+    changed = db.or_(
+        Person.membership_status_id.is_(None), Person.membership_status_id != status
+    )
+    new_members = []
+    if status == MembershipStatus.CONFIRMED:
+        new_members = (
+            column_query(Person).filter(Person.id.in_(person_ids), changed).all()
+        )
+
+    values = dict(
+        membership_status_id=status, status_changed_at=datetime.now(timezone.utc)
+    )
+    if status == MembershipStatus.CONFIRMED:
+        values["joining_date"] = db.func.coalesce(Person.joining_date, date.today())
+
+    result = db.session.execute(
+        update(Person)
+        .where(Person.id.in_(person_ids), changed)
+        .values(**values)
+        .execution_options(synchronize_session="fetch")
+    )
+    return result.rowcount, new_members
 
 
 @main.route("/applications/<int:person_id>/", methods=["POST"])
@@ -373,15 +468,7 @@ def handle_application(person_id):
         db.session.commit()
 
         flash(f"Mitgliedsantrag für {application.name} angenommen", category="success")
-        send_email(
-            subject=_("Willkommen bei PeP et al. e.V."),
-            sender=current_app.config["MAIL_SENDER"],
-            recipients=[application.email],
-            body=render_template(
-                "mail/welcome.txt",
-                new_member=application,
-            ),
-        )
+        send_welcome_mail(application)
         application.membership_status_id = MembershipStatus.CONFIRMED
     elif decision == "deny":
         flash(f"Mitgliedsantrag für {application.name} abgelehnt", category="danger")
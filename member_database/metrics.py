@@ -0,0 +1,39 @@
+from collections import Counter
+from threading import Lock
+
+
+class Metrics:
+    """
+    Minimal thread safe in-process counters and gauges.
+
+    Values are per worker process, they are exposed as json
+    via the ``main.metrics`` endpoint.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._counters = Counter()
+        self._gauges = {}
+
+    def inc(self, name, value=1):
+        with self._lock:
+            self._counters[name] += value
+
+    def gauge(self, name, func):
+        """Register a function returning the current value of ``name``"""
+        with self._lock:
+            self._gauges[name] = func
+
+    def snapshot(self):
+        with self._lock:
+            values = dict(self._counters)
+            gauges = dict(self._gauges)
+        values.update({name: func() for name, func in gauges.items()})
+        return values
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+
+
+metrics = Metrics()
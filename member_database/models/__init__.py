@@ -1,11 +1,18 @@
-from .base import db, as_dict
+from .base import db, as_dict, column_query, use_replica
 from .person import Person, MembershipStatus, MembershipType, TUStatus
+from .retention import RetentionCheckpoint
+from .search import person_search, search_filter
 
 __all__ = [
     "db",
     "as_dict",
+    "column_query",
+    "use_replica",
     "Person",
     "MembershipStatus",
     "TUStatus",
     "MembershipType",
+    "RetentionCheckpoint",
+    "person_search",
+    "search_filter",
 ]
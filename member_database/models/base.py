@@ -1,24 +1,14 @@
-from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import MetaData
-import json
-import decimal
+from functools import wraps
+import time
 
+from flask import g, has_request_context, session
+from flask_sqlalchemy import SQLAlchemy, SignallingSession, get_state
+from sqlalchemy import MetaData, event, orm
+from sqlalchemy.pool import NullPool
 
-class DecimalEncoder(json.JSONEncoder):
-    """Need to encode decimal objects from the html5.decimalinput fields
-    See https://stackoverflow.com/questions/1960516/python-json-serialize-a-decimal-object
-    and https://stackoverflow.com/questions/36438052/using-a-custom-json-encoder-for-sqlalchemys-postgresql-jsonb-implementation/36438671
-    """
-
-    def default(self, o):
-        if isinstance(o, decimal.Decimal):
-            return float(o)
-        return super(DecimalEncoder, self).default(o)
-
-
-def dumps(*args, **kwargs):
-    kwargs.update(cls=DecimalEncoder)
-    return json.dumps(*args, **kwargs)
+from ..json import dumps, loads
+from .pool import InstrumentedQueuePool
+from .sqlite import apply_sqlite_profile
 
 
 # necessary for named indexes to work in migrations
@@ -29,8 +19,122 @@ naming_convention = {
     "fk": "fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s",
     "pk": "pk_%(table_name)s",
 }
-db = SQLAlchemy(
-    engine_options={"json_serializer": dumps},
+
+
+REPLICA_BIND = "replica"
+
+
+def has_replica(app):
+    return REPLICA_BIND in (app.config["SQLALCHEMY_BINDS"] or {})
+
+
+class RoutingSession(SignallingSession):
+    """
+    Session that sends reads of views decorated with ``use_replica``
+    to the replica bind, if one is configured.
+
+    Everything else stays on the primary: flushes, insert / update / delete
+    statements, reads after something was written in the same request and
+    all requests of a client for ``DATABASE_REPLICA_STICKY_SECONDS`` after
+    it wrote something, so it sees its own writes after a redirect.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        # sqlalchemy passes further arguments, e.g. via scoped_session.get_bind,
+        # which flask-sqlalchemy's get_bind does not accept
+        if (
+            has_request_context()
+            and g.get("use_replica", False)
+            and not g.get("database_written", False)
+            and not self._flushing
+            and not getattr(clause, "is_dml", False)
+            and has_replica(self.app)
+            and session.get("primary_until", 0) < time.time()
+        ):
+            return get_state(self.app).db.get_engine(self.app, bind=REPLICA_BIND)
+        return super().get_bind(mapper, clause)
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def remember_write(db_session, flush_context):
+    if has_request_context():
+        g.database_written = True
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+    def apply_driver_hacks(self, app, sa_url, options):
+        sa_url, options = super().apply_driver_hacks(app, sa_url, options)
+        if sa_url.get_backend_name() == "sqlite":
+            # the engine is created without access to the app,
+            # create_engine picks this up again
+            if app.config["SQLITE_PROFILE"]:
+                options["sqlite_profile_busy_timeout"] = app.config[
+                    "SQLITE_BUSY_TIMEOUT"
+                ]
+            return sa_url, options
+
+        config = app.config
+        if config["DATABASE_PGBOUNCER"]:
+            # PgBouncer does the pooling, every checkout gets a fresh
+            # connection from it. psycopg2 does not use server side
+            # prepared statements, so there is nothing else to disable.
+            options["poolclass"] = NullPool
+        else:
+            options.update(
+                poolclass=InstrumentedQueuePool,
+                pool_size=config["DATABASE_POOL_SIZE"],
+                max_overflow=config["DATABASE_MAX_OVERFLOW"],
+                pool_timeout=config["DATABASE_POOL_TIMEOUT"],
+                pool_recycle=config["DATABASE_POOL_RECYCLE"],
+                pool_pre_ping=config["DATABASE_POOL_PRE_PING"],
+            )
+        return sa_url, options
+
+    def create_engine(self, sa_url, engine_opts):
+        busy_timeout = engine_opts.pop("sqlite_profile_busy_timeout", None)
+        engine = super().create_engine(sa_url, engine_opts)
+        if busy_timeout is not None:
+            apply_sqlite_profile(engine, busy_timeout)
+        return engine
+
+    def init_app(self, app):
+        super().init_app(app)
+
+        @app.before_request
+        def reset_routing():
+            # g lives as long as the app context, which might span requests
+            g.pop("use_replica", None)
+            g.pop("database_written", None)
+
+        @app.after_request
+        def stick_to_primary(response):
+            if g.get("database_written", False) and has_replica(app):
+                sticky = app.config["DATABASE_REPLICA_STICKY_SECONDS"]
+                session["primary_until"] = time.time() + sticky
+            return response
+
+
+def use_replica(view):
+    """
+    Route the read queries of a read-only view to the replica database.
+    With the sqlite profile, its transactions start deferred.
+    """
+
+    @wraps(view)
+    def decorated_view(*args, **kwargs):
+        g.use_replica = True
+        return view(*args, **kwargs)
+
+    # copied to the outer decorators by functools.wraps
+    decorated_view.read_only = True
+    return decorated_view
+
+
+db = RoutingSQLAlchemy(
+    engine_options={"json_serializer": dumps, "json_deserializer": loads},
     metadata=MetaData(naming_convention=naming_convention),
 )
 
@@ -38,3 +142,13 @@ db = SQLAlchemy(
 def as_dict(instance):
     """Transform a model instance into a dict"""
     return {c.name: getattr(instance, c.name) for c in instance.__table__.columns}
+
+
+def column_query(model):
+    """
+    Query all columns of a model as plain rows instead of model instances.
+
+    Use this for read-only listings, the rows are named tuples that
+    skip the identity map, change tracking and eager loaded relationships.
+    """
+    return db.session.query(*model.__table__.columns)
@@ -0,0 +1,64 @@
+"""
+Cheap row counts for pagers of large tables.
+
+An exact ``COUNT(*)`` has to visit every matching row. For the pager of a
+list view an estimate is good enough once there are many pages:
+
+- on postgresql, the row estimate of the query planner is used, which
+  comes from the table statistics and costs no more than planning;
+- elsewhere there are no usable statistics, so at most ``limit + 1``
+  rows are counted and larger results have no count at all.
+
+Small results are always counted exactly.
+"""
+import json
+
+from flask import current_app
+from flask_sqlalchemy import BaseQuery
+from sqlalchemy import func, literal_column
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+
+class Explain(Executable, ClauseElement):
+    """``EXPLAIN (FORMAT JSON)`` of a select, postgresql only"""
+
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(Explain, "postgresql")
+def compile_explain(element, compiler, **kwargs):
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kwargs)
+
+
+def planner_rows(session, statement):
+    """Number of rows the postgresql planner expects ``statement`` to return"""
+    plan = session.execute(Explain(statement)).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+class EstimatedCountQuery(BaseQuery):
+    """
+    Count query, e.g. ``get_count_query`` of an admin view, whose
+    ``scalar()`` counts exactly up to ``ADMIN_EXACT_COUNT_LIMIT`` rows.
+    Above, it returns the planner estimate on postgresql and None otherwise.
+    """
+
+    def scalar(self):
+        limit = current_app.config["ADMIN_EXACT_COUNT_LIMIT"]
+        rows = self.with_entities(literal_column("1"))
+
+        if self.session.get_bind().dialect.name == "postgresql":
+            estimate = planner_rows(self.session, rows.statement)
+            if estimate > limit:
+                return estimate
+            return super().scalar()
+
+        capped = rows.limit(limit + 1).subquery()
+        n = self.session.query(func.count()).select_from(capped).scalar()
+        return n if n <= limit else None
@@ -1,8 +1,14 @@
-from datetime import date
+from datetime import date, datetime, timezone
+
+from sqlalchemy import event
 
 from .base import db
 
 
+def utcnow():
+    return datetime.now(timezone.utc)
+
+
 class Person(db.Model):
 
     id = db.Column(db.Integer, primary_key=True)
@@ -33,10 +39,27 @@ class Person(db.Model):
     date_of_birth = db.Column(db.Date, nullable=True)
     joining_date = db.Column(db.Date, default=None, nullable=True)
 
+    # when membership_status last changed, used by the retention policy
+    status_changed_at = db.Column(db.DateTime(timezone=True), default=utcnow)
+
+    __table_args__ = (
+        db.Index(
+            "ix_person_membership_status_changed",
+            "membership_status_id",
+            "status_changed_at",
+        ),
+    )
+
     def __repr__(self):
         return f"<Person {self.id}: {self.name}>"
 
 
+@event.listens_for(Person.membership_status_id, "set")
+def update_status_changed_at(person, value, oldvalue, initiator):
+    if value != oldvalue:
+        person.status_changed_at = utcnow()
+
+
 class TUStatus(db.Model):
     STUDENT = "Student*in"
     PHD = "Doktorand*in"
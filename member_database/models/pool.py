@@ -0,0 +1,51 @@
+"""
+Connection pool instrumentation.
+
+The counters and gauges end up in the per worker ``metrics``, so one can
+tell whether latency spikes come from waiting for a database connection.
+"""
+from weakref import WeakSet
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.pool import QueuePool
+
+from ..metrics import metrics
+
+
+_pools = WeakSet()
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records checkout wait times, overflows and timeouts"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        _pools.add(self)
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            metrics.inc("database.pool.timeouts")
+            raise
+        finally:
+            metrics.inc("database.pool.checkouts")
+            metrics.inc("database.pool.checkout_seconds", time.perf_counter() - start)
+
+    def _inc_overflow(self):
+        created = super()._inc_overflow()
+        # the first pool_size connections also count as "overflow" internally
+        if created and self._overflow > 0:
+            metrics.inc("database.pool.overflow_connections")
+        return created
+
+
+metrics.gauge(
+    "database.pool.in_use", lambda: sum(pool.checkedout() for pool in list(_pools))
+)
+metrics.gauge(
+    "database.pool.overflow",
+    lambda: sum(max(pool.overflow(), 0) for pool in list(_pools)),
+)
@@ -0,0 +1,9 @@
+from .base import db
+
+
+class RetentionCheckpoint(db.Model):
+    """Highest id processed by a retention task in its current pass"""
+
+    task = db.Column(db.String, primary_key=True)
+    last_id = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime(timezone=True))
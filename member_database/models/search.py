@@ -0,0 +1,179 @@
+"""
+Indexed substring and fuzzy search over the name and email of persons.
+
+On postgresql, ``pg_trgm`` GIN indexes on both columns serve
+``ILIKE '%term%'`` and the word similarity operator used for fuzzy search.
+
+On sqlite, ``person_search`` is an FTS5 table with the trigram tokenizer,
+using ``person`` as external content. Triggers keep it in sync on every
+write, including bulk updates that bypass the ORM. Batch migrations on
+sqlite recreate the person table, which drops the triggers, so
+``migrations/env.py`` restores them with :func:`ensure_search_triggers`.
+
+Both are created by the migrations and by ``db.create_all``.
+"""
+from sqlalchemy import event, func, literal_column, or_, select, text
+from sqlalchemy.sql import column, table
+
+from .base import db
+from .person import Person
+
+
+SEARCH_TABLE = "person_search"
+# alembic ignores the search table and indexes, they are not in the models
+SEARCH_PREFIX = "person_search"
+TRGM_INDEX_PREFIX = "ix_person_search_"
+
+# fuzzy search returns the best matches only
+FUZZY_LIMIT = 100
+
+search_table = table(SEARCH_TABLE, column("rowid"), column("rank"))
+
+SQLITE_DDL = (
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+        name, email, content='person', content_rowid='id', tokenize='trigram'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_insert AFTER INSERT ON person
+    BEGIN
+        INSERT INTO {SEARCH_TABLE}(rowid, name, email)
+        VALUES (new.id, new.name, new.email);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_delete AFTER DELETE ON person
+    BEGIN
+        INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, name, email)
+        VALUES ('delete', old.id, old.name, old.email);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_update
+    AFTER UPDATE OF name, email ON person
+    BEGIN
+        INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, name, email)
+        VALUES ('delete', old.id, old.name, old.email);
+        INSERT INTO {SEARCH_TABLE}(rowid, name, email)
+        VALUES (new.id, new.name, new.email);
+    END""",
+    f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')",
+)
+
+POSTGRESQL_DDL = (
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    f"CREATE INDEX IF NOT EXISTS {TRGM_INDEX_PREFIX}name"
+    " ON person USING gin (name gin_trgm_ops)",
+    f"CREATE INDEX IF NOT EXISTS {TRGM_INDEX_PREFIX}email"
+    " ON person USING gin (email gin_trgm_ops)",
+)
+
+
+SQLITE_TRIGGERS = tuple(
+    f"{SEARCH_TABLE}_{operation}" for operation in ("insert", "delete", "update")
+)
+
+
+def create_search_index(connection):
+    ddl = {"sqlite": SQLITE_DDL, "postgresql": POSTGRESQL_DDL}
+    for statement in ddl.get(connection.dialect.name, ()):
+        connection.execute(text(statement))
+
+
+def ensure_search_triggers(connection):
+    """
+    Recreate the sqlite search triggers and rebuild the index if the person
+    table was recreated without them. Returns whether they were missing.
+    """
+    if connection.dialect.name != "sqlite":
+        return False
+
+    names = set(
+        connection.execute(
+            text("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")
+        ).scalars()
+    )
+    # before the migration creating the search index
+    if SEARCH_TABLE not in names or names.issuperset(SQLITE_TRIGGERS):
+        return False
+
+    create_search_index(connection)
+    return True
+
+
+@event.listens_for(Person.__table__, "after_create")
+def person_table_created(target, connection, **kwargs):
+    create_search_index(connection)
+
+
+@event.listens_for(Person.__table__, "before_drop")
+def person_table_dropped(target, connection, **kwargs):
+    if connection.dialect.name == "sqlite":
+        connection.execute(text(f"DROP TABLE IF EXISTS {SEARCH_TABLE}"))
+
+
+def escape_like(term):
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def fts_phrase(term):
+    return '"' + term.replace('"', '""') + '"'
+
+
+def trigrams(term):
+    term = term.lower()
+    return sorted({term[i : i + 3] for i in range(len(term) - 2)})
+
+
+def person_search(term, fuzzy=False):
+    """
+    Select the ids of the persons whose name or email contains ``term``,
+    ignoring case. With ``fuzzy``, return the persons most similar to
+    ``term`` instead, e.g. to find "Feynman" when searching "Feinmann".
+    """
+    dialect = db.session.get_bind().dialect.name
+
+    # the trigram tokenizer needs at least three characters
+    if dialect == "sqlite" and len(term) >= 3:
+        if fuzzy:
+            # matches any trigram of the term, ranked by how many match
+            match = " OR ".join(fts_phrase(trigram) for trigram in trigrams(term))
+        else:
+            match = fts_phrase(term)
+
+        query = select(search_table.c.rowid).where(
+            literal_column(SEARCH_TABLE).op("MATCH")(match)
+        )
+        if fuzzy:
+            query = query.order_by(search_table.c.rank).limit(FUZZY_LIMIT)
+        return query
+
+    if dialect == "postgresql" and fuzzy:
+        similarity = func.greatest(
+            func.word_similarity(term, Person.name),
+            func.word_similarity(term, Person.email),
+        )
+        return (
+            select(Person.id)
+            .where(or_(Person.name.op("%>")(term), Person.email.op("%>")(term)))
+            .order_by(similarity.desc())
+            .limit(FUZZY_LIMIT)
+        )
+
+    pattern = f"%{escape_like(term)}%"
+    return select(Person.id).where(
+        or_(
+            Person.name.ilike(pattern, escape="\\"),
+            Person.email.ilike(pattern, escape="\\"),
+        )
+    )
+
+
+def search_filter(id_column, search):
+    """
+    Filter condition for ``id_column``, the id of a person, matching all
+    space separated terms of ``search``. A leading ``~`` makes it fuzzy.
+    """
+    fuzzy = search.startswith("~")
+    terms = search.lstrip("~").split()
+    return db.and_(
+        db.true(),
+        *(
+            id_column.in_(person_search(term, fuzzy).scalar_subquery())
+            for term in terms
+        ),
+    )
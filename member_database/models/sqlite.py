@@ -0,0 +1,59 @@
+"""
+Opt-in performance profile for sqlite deployments with several workers.
+
+WAL lets readers continue while one connection writes, ``synchronous=NORMAL``
+only syncs at checkpoints instead of on every commit (still safe in WAL
+mode, only the last transactions might be lost on power loss) and
+``busy_timeout`` makes writers wait for the lock instead of failing.
+
+Transactions start with ``BEGIN IMMEDIATE``, except for GET / HEAD requests
+of views marked read-only by ``use_replica``. A deferred transaction that
+reads first and writes later needs to upgrade its lock, which fails right
+away with "database is locked" if another connection wrote in between,
+the busy timeout does not help in that case. The HTTP method alone is not
+enough, e.g. following a confirmation link is a GET request that writes,
+and so do the hooks of the first request.
+"""
+from flask import current_app, has_request_context, request
+from sqlalchemy import event
+
+
+MMAP_SIZE = 256 * 1024**2
+# negative values are in KiB instead of pages
+CACHE_SIZE = -64 * 1024
+
+READ_ONLY_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+def is_read_only_request():
+    if not has_request_context() or request.method not in READ_ONLY_METHODS:
+        return False
+    # the first request hooks write, they run before the view
+    if not current_app.got_first_request:
+        return False
+    view = current_app.view_functions.get(request.endpoint)
+    return getattr(view, "read_only", False)
+
+
+def apply_sqlite_profile(engine, busy_timeout):
+    """Setup pragmas and immediate transactions for all connections of ``engine``"""
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        # let sqlalchemy emit BEGIN, pysqlite would only do it before writes
+        dbapi_connection.isolation_level = None
+
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode = WAL")
+        cursor.execute("PRAGMA synchronous = NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout = {int(busy_timeout)}")
+        cursor.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+        cursor.execute(f"PRAGMA cache_size = {CACHE_SIZE}")
+        cursor.close()
+
+    @event.listens_for(engine, "begin")
+    def begin(connection):
+        if is_read_only_request():
+            connection.exec_driver_sql("BEGIN")
+        else:
+            connection.exec_driver_sql("BEGIN IMMEDIATE")
@@ -0,0 +1,211 @@
+"""
+Bulk import of persons from csv files, e.g. the member list of a spreadsheet.
+
+The file is read row by row and every row is validated with the rules of
+the :class:`MembershipForm`. Valid rows are upserted by email in batches:
+one ``INSERT ... ON CONFLICT (email) DO UPDATE`` per batch, each batch is
+its own transaction. Empty cells do not overwrite existing values.
+
+Columns: ``name`` and ``email`` are required, ``membership_type``,
+``membership_status``, ``joining_date`` and ``date_of_birth`` (ISO dates)
+are optional. Other columns are ignored.
+"""
+import csv
+from datetime import date, datetime, timezone
+import logging
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import and_, case, func
+from sqlalchemy.dialects import postgresql, sqlite
+from werkzeug.datastructures import MultiDict
+
+from .forms import MembershipForm
+from .models import db, Person, MembershipStatus
+
+
+log = logging.getLogger(__name__)
+
+REQUIRED_COLUMNS = ("name", "email")
+# kept if the cell is empty
+OPTIONAL_COLUMNS = (
+    "membership_type_id",
+    "membership_status_id",
+    "joining_date",
+    "date_of_birth",
+)
+
+
+class ImportReport:
+    def __init__(self):
+        self.rows = 0
+        self.inserted = 0
+        self.updated = 0
+        # (line number, messages) of rows that were not imported
+        self.errors = []
+
+    def __repr__(self):
+        return (
+            f"<ImportReport rows={self.rows} inserted={self.inserted}"
+            f" updated={self.updated} errors={len(self.errors)}>"
+        )
+
+
+def parse_date(value, name, errors):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        errors.append(f"{name}: Ungültiges Datum {value!r}, erwartet JJJJ-MM-TT")
+
+
+def validate_row(form, row, status=None):
+    """
+    Validate a csv row with ``form``, a :class:`MembershipForm` that is
+    reused for all rows. Returns the column values for the person table
+    and a list of error messages.
+    """
+    row = {k.strip(): v.strip() for k, v in row.items() if k and v and v.strip()}
+
+    form.process(formdata=MultiDict(row))
+    form.validate()
+    errors = [
+        f"{name}: {message}"
+        for name, messages in form.errors.items()
+        for message in messages
+    ]
+
+    status = row.get("membership_status", status)
+    if status is not None and status not in MembershipStatus.STATES:
+        errors.append(f"membership_status: Unbekannter Status {status!r}")
+
+    values = dict(
+        name=form.name.data,
+        email=form.email.data,
+        # the form falls back to its default, but that must not
+        # overwrite the type of existing persons
+        membership_type_id=row.get("membership_type"),
+        membership_status_id=status,
+        joining_date=None,
+        date_of_birth=None,
+    )
+    for column in ("joining_date", "date_of_birth"):
+        if column in row:
+            values[column] = parse_date(row[column], column, errors)
+
+    if values["date_of_birth"] and values["date_of_birth"] > date.today():
+        errors.append("date_of_birth: Datum darf nicht in der Zukunft liegen")
+
+    return values, errors
+
+
+def upsert_statement():
+    dialect = db.session.get_bind().dialect.name
+    if dialect == "postgresql":
+        insert = postgresql.insert
+    elif dialect == "sqlite":
+        insert = sqlite.insert
+    else:
+        raise NotImplementedError(f"Import is not supported for {dialect}")
+
+    person = Person.__table__.c
+    stmt = insert(Person.__table__)
+    new = stmt.excluded
+
+    set_ = {c: func.coalesce(new[c], person[c]) for c in OPTIONAL_COLUMNS}
+    set_["name"] = new.name
+    status_changed = and_(
+        new.membership_status_id.isnot(None),
+        person.membership_status_id.is_distinct_from(new.membership_status_id),
+    )
+    set_["status_changed_at"] = case(
+        (status_changed, new.status_changed_at), else_=person.status_changed_at
+    )
+    return stmt.on_conflict_do_update(index_elements=["email"], set_=set_)
+
+
+def upsert_batch(batch, report, dry_run=False):
+    if not batch:
+        return
+
+    rows = list(batch.values())
+    existing = (
+        db.session.query(func.count(Person.id))
+        .filter(Person.email.in_(batch.keys()))
+        .scalar()
+    )
+    report.updated += existing
+    report.inserted += len(rows) - existing
+
+    if dry_run:
+        return
+
+    now = datetime.now(timezone.utc)
+    for row in rows:
+        row["status_changed_at"] = now
+        row["email_valid"] = False
+    # executemany of one cached statement, compiling a multi row
+    # VALUES clause for every batch costs more than the insert itself
+    db.session.execute(upsert_statement(), rows)
+    db.session.commit()
+
+
+def import_persons(lines, status=None, batch_size=None, dry_run=False):
+    """
+    Import persons from an iterable of csv ``lines``, e.g. an open file.
+
+    ``status`` is the membership status of rows without one.
+    Returns an :class:`ImportReport`.
+    """
+    batch_size = batch_size or current_app.config["IMPORT_BATCH_SIZE"]
+    report = ImportReport()
+
+    reader = csv.DictReader(lines)
+    missing = [c for c in REQUIRED_COLUMNS if c not in (reader.fieldnames or ())]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+
+    form = MembershipForm(meta={"csrf": False})
+    # by email, a later row of the same person replaces an earlier one
+    batch = {}
+    for row in reader:
+        report.rows += 1
+        values, errors = validate_row(form, row, status)
+        if errors:
+            report.errors.append((reader.line_num, errors))
+            continue
+
+        batch[values["email"]] = values
+        if len(batch) >= batch_size:
+            upsert_batch(batch, report, dry_run)
+            batch = {}
+
+    upsert_batch(batch, report, dry_run)
+    return report
+
+
+@click.command("import-persons")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "--status",
+    type=click.Choice(MembershipStatus.STATES),
+    help="Membership status of rows without one",
+)
+@click.option("--batch-size", type=int, help="Rows per transaction [IMPORT_BATCH_SIZE]")
+@click.option("--dry-run", is_flag=True, help="Only validate and report")
+@with_appcontext
+def import_persons_command(path, status, batch_size, dry_run):
+    """Import or update persons from the csv file PATH"""
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        try:
+            report = import_persons(f, status, batch_size, dry_run)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+
+    for line, errors in report.errors:
+        click.echo(f"line {line}: {'; '.join(errors)}", err=True)
+    click.echo(f"rows: {report.rows}")
+    click.echo(f"inserted: {report.inserted}")
+    click.echo(f"updated: {report.updated}")
+    click.echo(f"errors: {len(report.errors)}")
+    log.info(f"Imported persons from {path}: {report}")
@@ -0,0 +1,170 @@
+"""
+Token bucket rate limiting for the public endpoints that send emails.
+
+Each limited endpoint consumes one token from a bucket per client ip
+and one from a bucket per target email address on every POST.
+Buckets are stored in the local sqlite file ``RATELIMIT_STORAGE``, so the
+limits hold across all gunicorn workers on a host. ``memory`` keeps them
+in the current process, which is only correct with a single worker.
+"""
+from functools import wraps
+from threading import Lock
+import logging
+import sqlite3
+import time
+
+from flask import current_app, request
+from werkzeug.exceptions import TooManyRequests
+
+from .metrics import metrics
+
+
+log = logging.getLogger(__name__)
+
+# buckets untouched for this long are full again and can be forgotten
+PRUNE_AFTER = 24 * 3600
+
+UNITS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+def parse_rate(rate):
+    """Parse a rate like "5/hour" into (capacity, tokens per second)"""
+    amount, _, unit = rate.partition("/")
+    amount = int(amount)
+    return amount, amount / UNITS[unit.strip().rstrip("s")]
+
+
+def refill(tokens, updated, now, capacity, per_second):
+    return min(capacity, tokens + (now - updated) * per_second)
+
+
+class MemoryBucketStore:
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self._lock = Lock()
+        self._buckets = {}
+        self._last_prune = clock()
+
+    def take(self, key, capacity, per_second):
+        """
+        Take a token from the bucket ``key``.
+        Returns 0 on success, else the seconds until a token is available.
+        """
+        with self._lock:
+            now = self.clock()
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens = refill(tokens, updated, now, capacity, per_second)
+
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                wait = 0
+            else:
+                self._buckets[key] = (tokens, now)
+                wait = (1 - tokens) / per_second
+
+            if now - self._last_prune > PRUNE_AFTER:
+                self._buckets = {
+                    k: v for k, v in self._buckets.items() if now - v[1] < PRUNE_AFTER
+                }
+                self._last_prune = now
+
+            return wait
+
+
+class SQLiteBucketStore:
+    """Buckets stored in a local sqlite file, shared by all processes on a host"""
+
+    def __init__(self, path, clock=time.time):
+        self.path = path
+        self.clock = clock
+        with self._connect() as con:
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS bucket"
+                " (key TEXT PRIMARY KEY, tokens REAL, updated REAL)"
+            )
+
+    def _connect(self):
+        con = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        con.execute("PRAGMA journal_mode = WAL")
+        return con
+
+    def take(self, key, capacity, per_second):
+        con = self._connect()
+        try:
+            # take the write lock right away, so no other worker
+            # can read the bucket before we updated it
+            con.execute("BEGIN IMMEDIATE")
+            now = self.clock()
+            row = con.execute(
+                "SELECT tokens, updated FROM bucket WHERE key = ?", (key,)
+            ).fetchone()
+            tokens, updated = row if row is not None else (capacity, now)
+            tokens = refill(tokens, updated, now, capacity, per_second)
+
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0
+            else:
+                wait = (1 - tokens) / per_second
+
+            con.execute(
+                "INSERT OR REPLACE INTO bucket (key, tokens, updated) VALUES (?, ?, ?)",
+                (key, tokens, now),
+            )
+            con.execute("DELETE FROM bucket WHERE updated < ?", (now - PRUNE_AFTER,))
+            con.execute("COMMIT")
+            return wait
+        finally:
+            con.close()
+
+
+def get_store():
+    store = current_app.extensions.get("ratelimit")
+    if store is None:
+        path = current_app.config["RATELIMIT_STORAGE"]
+        store = MemoryBucketStore() if path == "memory" else SQLiteBucketStore(path)
+        current_app.extensions["ratelimit"] = store
+    return store
+
+
+def client_ip():
+    # request.remote_addr is the real client, if the app is behind a
+    # proxy, that has to be configured using werkzeug's ProxyFix
+    return request.remote_addr or "unknown"
+
+
+def rate_limit(name, address_field=None):
+    """
+    Limit POST requests to the decorated view per client ip
+    and, if ``address_field`` is given, per value of that form field.
+
+    The rates are configured via ``RATELIMIT_PER_IP`` and
+    ``RATELIMIT_PER_ADDRESS``, exceeding them aborts with 429.
+    """
+
+    def decorator(func):
+        @wraps(func)
+        def decorated_function(*args, **kwargs):
+            config = current_app.config
+            if request.method != "POST" or not config["RATELIMIT_ENABLED"]:
+                return func(*args, **kwargs)
+
+            buckets = [("ip", client_ip(), config["RATELIMIT_PER_IP"])]
+            address = request.form.get(address_field or "", "").strip().lower()
+            if address:
+                buckets.append(("address", address, config["RATELIMIT_PER_ADDRESS"]))
+
+            store = get_store()
+            for kind, value, rate in buckets:
+                wait = store.take(f"{name}:{kind}:{value}", *parse_rate(rate))
+                if wait > 0:
+                    metrics.inc(f"ratelimit.{name}.limited_{kind}")
+                    log.warning(f"Rate limit per {kind} exceeded for {name}")
+                    raise TooManyRequests(retry_after=int(wait) + 1)
+
+            metrics.inc(f"ratelimit.{name}.allowed")
+            return func(*args, **kwargs)
+
+        return decorated_function
+
+    return decorator
@@ -0,0 +1,252 @@
+"""
+Retention policy for stale personal data.
+
+Persons whose membership status is in ``RETENTION_PERSONS`` for longer than
+the configured number of days are deleted, or anonymised if registrations
+or a user account still reference them. Persons with registrations of
+events that are not yet stale are kept until those are. Registrations of
+closed events whose last registration is older than ``RETENTION_EVENT_DAYS``
+are deleted, from the live and the archive table.
+
+Rows are processed in batches of ascending ids, every batch is its own
+short transaction, so the live app never waits long for locks.
+The highest processed id is stored as checkpoint after each batch,
+an interrupted run resumes there. When a pass is complete, the
+checkpoint is reset, so rows that become stale later are found again.
+"""
+from datetime import datetime, timedelta, timezone
+from functools import partial
+import logging
+import time
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import String, cast, delete, func, update
+
+from .authentication import User
+from .events import Event, EventRegistration, ArchivedEventRegistration
+from .models import db, Person, RetentionCheckpoint
+
+
+log = logging.getLogger(__name__)
+
+ANONYMISED_NAME = "Anonymisiert"
+ANONYMISED_DOMAIN = "anonymised.invalid"
+NO_TIMESTAMP = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def get_checkpoint(task):
+    checkpoint = RetentionCheckpoint.query.get(task)
+    return checkpoint.last_id if checkpoint is not None else 0
+
+
+def set_checkpoint(task, last_id):
+    checkpoint = RetentionCheckpoint.query.get(task)
+    if checkpoint is None:
+        checkpoint = RetentionCheckpoint(task=task)
+        db.session.add(checkpoint)
+    checkpoint.last_id = last_id
+    checkpoint.updated_at = datetime.now(timezone.utc)
+
+
+def stale_persons(status, days):
+    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+    return db.session.query(Person.id).filter(
+        Person.membership_status_id == status,
+        Person.status_changed_at < cutoff,
+        ~Person.email.endswith("@" + ANONYMISED_DOMAIN),
+    )
+
+
+def live_registrations(ids):
+    """Persons of ``ids`` registered for events that are not stale yet"""
+    query = db.session.query(EventRegistration.person_id).filter(
+        EventRegistration.person_id.in_(ids)
+    )
+    days = current_app.config["RETENTION_EVENT_DAYS"]
+    if days is not None:
+        query = query.filter(
+            EventRegistration.event_id.notin_(stale_events(days).scalar_subquery())
+        )
+    return {person_id for (person_id,) in query}
+
+
+def process_persons(ids, dry_run=False):
+    """
+    Delete unreferenced persons, anonymise the others, unless they are
+    registered for events that are not stale yet, the organisers still
+    need their data. Returns the number of deleted, anonymised and kept persons.
+    """
+    referenced = {
+        person_id
+        for (person_id,) in db.session.query(EventRegistration.person_id)
+        .filter(EventRegistration.person_id.in_(ids))
+        .union(
+            db.session.query(ArchivedEventRegistration.person_id).filter(
+                ArchivedEventRegistration.person_id.in_(ids)
+            ),
+            db.session.query(User.person_id).filter(User.person_id.in_(ids)),
+        )
+    }
+    live = live_registrations(ids)
+    to_delete = [i for i in ids if i not in referenced]
+    to_anonymise = [i for i in ids if i in referenced and i not in live]
+
+    if not dry_run:
+        if to_delete:
+            db.session.execute(
+                delete(Person)
+                .where(Person.id.in_(to_delete))
+                .execution_options(synchronize_session=False)
+            )
+        if to_anonymise:
+            db.session.execute(
+                update(Person)
+                .where(Person.id.in_(to_anonymise))
+                .values(
+                    name=ANONYMISED_NAME,
+                    email="anonymised-"
+                    + cast(Person.id, String)
+                    + "@"
+                    + ANONYMISED_DOMAIN,
+                    email_valid=False,
+                    date_of_birth=None,
+                    tu_status_id=None,
+                )
+                .execution_options(synchronize_session=False)
+            )
+            # registration data contains names, addresses etc.
+            for model in (EventRegistration, ArchivedEventRegistration):
+                db.session.execute(
+                    update(model)
+                    .where(model.person_id.in_(to_anonymise))
+                    .values(data={})
+                    .execution_options(synchronize_session=False)
+                )
+    return len(to_delete), len(to_anonymise), len(live)
+
+
+def stale_events(days, model=EventRegistration):
+    """Closed events whose last registration in ``model`` is older than ``days``"""
+    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+    # registrations get their timestamp when confirmed, the ones without
+    # are unconfirmed or from before timestamps were recorded and count
+    # as old, unless their event was archived later
+    timestamp = func.coalesce(model.timestamp, Event.archived_at, NO_TIMESTAMP)
+    return (
+        db.session.query(model.event_id)
+        .join(Event)
+        .filter(Event.registration_open == False)
+        .group_by(model.event_id)
+        .having(func.max(timestamp) < cutoff)
+    )
+
+
+def stale_registrations(days, model=EventRegistration):
+    return db.session.query(model.id).filter(
+        model.event_id.in_(stale_events(days, model).scalar_subquery())
+    )
+
+
+def process_registrations(ids, dry_run=False, model=EventRegistration):
+    if not dry_run:
+        db.session.execute(
+            delete(model)
+            .where(model.id.in_(ids))
+            .execution_options(synchronize_session=False)
+        )
+    return len(ids)
+
+
+def run_task(task, query, id_column, process, batch_size, pause=0, dry_run=False):
+    """
+    Run ``process`` on the ids of ``query`` in batches, starting after the
+    checkpoint of ``task``. Returns the summed results of ``process``.
+    """
+    totals = None
+    last_id = get_checkpoint(task)
+
+    while True:
+        ids = [
+            row[0]
+            for row in query.filter(id_column > last_id)
+            .order_by(id_column)
+            .limit(batch_size)
+        ]
+
+        if ids:
+            result = process(ids, dry_run=dry_run)
+            result = result if isinstance(result, tuple) else (result,)
+            totals = result if totals is None else tuple(map(sum, zip(totals, result)))
+            last_id = ids[-1]
+
+        # pass complete, start from the beginning next time
+        done = len(ids) < batch_size
+        if not dry_run:
+            set_checkpoint(task, 0 if done else last_id)
+            db.session.commit()
+        else:
+            db.session.rollback()
+
+        if done:
+            return totals
+
+        if pause:
+            time.sleep(pause)
+
+
+def apply_retention(batch_size=500, pause=0, dry_run=False):
+    """Apply the configured retention policy, returns a report dict"""
+    config = current_app.config
+    report = {}
+
+    for status, days in config["RETENTION_PERSONS"].items():
+        deleted, anonymised, kept = run_task(
+            f"persons:{status}",
+            stale_persons(status, days),
+            Person.id,
+            process_persons,
+            batch_size=batch_size,
+            pause=pause,
+            dry_run=dry_run,
+        ) or (0, 0, 0)
+        report[f"persons.{status}.deleted"] = deleted
+        report[f"persons.{status}.anonymised"] = anonymised
+        report[f"persons.{status}.kept"] = kept
+
+    days = config["RETENTION_EVENT_DAYS"]
+    if days is not None:
+        tasks = {
+            "registrations": EventRegistration,
+            "archived_registrations": ArchivedEventRegistration,
+        }
+        for task, model in tasks.items():
+            (deleted,) = run_task(
+                task,
+                stale_registrations(days, model),
+                model.id,
+                partial(process_registrations, model=model),
+                batch_size=batch_size,
+                pause=pause,
+                dry_run=dry_run,
+            ) or (0,)
+            report[f"{task}.deleted"] = deleted
+
+    return report
+
+
+@click.command("retention")
+@click.option(
+    "--batch-size", type=int, help="Rows per transaction [RETENTION_BATCH_SIZE]"
+)
+@click.option("--pause", default=0.0, help="Seconds to wait between batches")
+@click.option("--dry-run", is_flag=True, help="Only report what would be changed")
+@with_appcontext
+def retention_command(batch_size, pause, dry_run):
+    """Delete or anonymise personal data according to the retention policy"""
+    batch_size = batch_size or current_app.config["RETENTION_BATCH_SIZE"]
+    report = apply_retention(batch_size=batch_size, pause=pause, dry_run=dry_run)
+    for key, value in report.items():
+        click.echo(f"{key}: {value}")
+        log.info(f"Retention {key}: {value}")
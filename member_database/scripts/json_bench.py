@@ -0,0 +1,64 @@
+"""
+Compare the json encoders on a participants list like the one returned by
+``events.participants``:
+
+    $ python -m member_database.scripts.json_bench -n 20000
+"""
+from argparse import ArgumentParser
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+import json as stdlib_json
+import timeit
+
+from .. import json
+
+
+parser = ArgumentParser()
+parser.add_argument("-n", "--participants", type=int, default=20000)
+parser.add_argument("-r", "--repeat", type=int, default=5)
+
+
+def make_participants(n):
+    start = datetime(2022, 6, 1, tzinfo=timezone.utc)
+    return [
+        {
+            "id": i,
+            "event_id": 1,
+            "person_id": i,
+            "status_name": "confirmed",
+            "name": f"Participant {i}",
+            "email": f"participant{i}@example.org",
+            "timestamp": start + timedelta(minutes=i),
+            "data": {
+                "degree": "Master",
+                "course": "Physik",
+                "chair": "E5",
+                "guests": Decimal(i % 4),
+                "vegetarian": i % 3 == 0,
+            },
+        }
+        for i in range(n)
+    ]
+
+
+def main():
+    args = parser.parse_args()
+    participants = make_participants(args.participants)
+
+    def run(name, dumps):
+        best = min(
+            timeit.repeat(lambda: dumps(participants), number=1, repeat=args.repeat)
+        )
+        size = len(dumps(participants)) / 1e6
+        print(f"{name:>14}: {best * 1000:7.1f} ms, {size:.1f} MB")
+
+    # the previous setup, flask's JSONEncoder subclass with the stdlib
+    run("stdlib", lambda obj: stdlib_json.dumps(obj, default=json.default))
+    if json.orjson is not None:
+        run("orjson", json.dumps)
+    else:
+        print("orjson is not installed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Simple load test, e.g. to compare the gunicorn worker profiles:
+
+    $ GUNICORN_PROFILE=gthread gunicorn -c gunicorn.conf.py "member_database:create_app()"
+    $ python -m member_database.scripts.loadtest http://localhost:5000/events/
+"""
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError
+from urllib.request import urlopen
+import time
+
+
+parser = ArgumentParser()
+parser.add_argument("urls", nargs="+")
+parser.add_argument("-c", "--concurrency", type=int, default=20)
+parser.add_argument("-n", "--requests", type=int, default=1000)
+
+
+def fetch(url):
+    start = time.perf_counter()
+    try:
+        with urlopen(url, timeout=60) as response:
+            response.read()
+            status = response.status
+    except HTTPError as e:
+        status = e.code
+    return status, time.perf_counter() - start
+
+
+def main():
+    args = parser.parse_args()
+    urls = [args.urls[i % len(args.urls)] for i in range(args.requests)]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        results = list(pool.map(fetch, urls))
+    duration = time.perf_counter() - start
+
+    latencies = sorted(latency for _, latency in results)
+    errors = sum(status != 200 for status, _ in results)
+
+    def percentile(p):
+        return latencies[int(p / 100 * (len(latencies) - 1))] * 1000
+
+    print(f"{args.requests} requests, concurrency {args.concurrency}")
+    print(f"throughput: {args.requests / duration:.1f} requests/s, errors: {errors}")
+    print(
+        f"latency: p50 {percentile(50):.1f} ms"
+        f", p90 {percentile(90):.1f} ms, p99 {percentile(99):.1f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Concurrent event registrations against a sqlite database,
+with and without the sqlite performance profile (SQLITE_PROFILE):
+
+    $ python -m member_database.scripts.sqlite_bench --processes 8 -n 100
+"""
+from argparse import ArgumentParser
+from multiprocessing import get_context
+from pathlib import Path
+import tempfile
+import time
+
+from .. import create_app
+from ..config import Config
+from ..models import db
+
+
+parser = ArgumentParser()
+parser.add_argument("-p", "--processes", type=int, default=8)
+parser.add_argument("-n", "--registrations", type=int, default=100)
+
+SCHEMA = {
+    "type": "object",
+    "properties": {"name": {"type": "string"}},
+    "required": ["name"],
+}
+
+
+def make_config(path, profile):
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{path}"
+        SQLITE_PROFILE = profile
+        MAIL_SUPPRESS_SEND = True
+        WTF_CSRF_ENABLED = False
+        RATELIMIT_ENABLED = False
+
+    return BenchConfig
+
+
+def setup_database(path, profile):
+    from ..events import Event
+
+    app = create_app(make_config(path, profile))
+    with app.app_context():
+        db.create_all()
+        db.session.add(
+            Event(
+                id=1, name="Bench", registration_open=True, registration_schema=SCHEMA
+            )
+        )
+        db.session.commit()
+        # runs the first request hooks
+        app.test_client().get("/events/")
+        db.engine.dispose()
+
+
+def register(path, profile, worker, n):
+    app = create_app(make_config(path, profile))
+    client = app.test_client()
+    errors = 0
+    for i in range(n):
+        r = client.post(
+            "/events/1/registration/",
+            data={"name": "Bench", "email": f"bench-{worker}-{i}@example.org"},
+        )
+        errors += r.status_code != 302
+    return errors
+
+
+def run(profile, processes, n):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = Path(tmpdir) / "bench.sqlite"
+        setup_database(path, profile)
+
+        start = time.perf_counter()
+        with get_context("spawn").Pool(processes) as pool:
+            errors = pool.starmap(
+                register, [(path, profile, worker, n) for worker in range(processes)]
+            )
+        duration = time.perf_counter() - start
+
+    total = processes * n
+    print(
+        f"profile {'on ' if profile else 'off'}: {total / duration:.1f} registrations/s"
+        f", {sum(errors)} errors of {total}"
+    )
+
+
+def main():
+    args = parser.parse_args()
+    for profile in (False, True):
+        run(profile, args.processes, args.registrations)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+from functools import lru_cache
+
+from flask import current_app
+from itsdangerous import URLSafeSerializer, URLSafeTimedSerializer
+
+
+# salts separate the different kinds of tokens,
+# a token for one purpose is not valid for another
+EDIT_SALT = "edit-key"
+GDPR_DATA_SALT = "request_gdpr_data-key"
+REGISTRATION_SALT = "registration-key"
+PASSWORD_RESET_SALT = "password-reset"
+
+
+@lru_cache(maxsize=None)
+def _get_serializer(secret_keys, salt, timed):
+    cls = URLSafeTimedSerializer if timed else URLSafeSerializer
+    return cls(list(secret_keys), salt=salt)
+
+
+def get_serializer(salt, timed=True):
+    """
+    Return a cached serializer for ``salt``.
+
+    Tokens are signed using ``SECRET_KEY``, the keys in
+    ``SECRET_KEY_FALLBACKS`` (newest first) are still accepted when loading,
+    so rotating the secret key does not invalidate all links at once.
+    Valid tokens signed with the current key only need a single check.
+    """
+    config = current_app.config
+    # itsdangerous expects the newest key last
+    secret_keys = (*reversed(config["SECRET_KEY_FALLBACKS"]), config["SECRET_KEY"])
+    return _get_serializer(secret_keys, salt, timed)
+
+
+def dumps_token(obj, salt, timed=True):
+    return get_serializer(salt, timed).dumps(obj)
+
+
+def loads_token(token, salt, max_age=None, timed=True):
+    """
+    Load a token, raises ``itsdangerous.BadData`` for invalid tokens
+    and ``itsdangerous.SignatureExpired`` if it is older than ``max_age``
+    """
+    if timed:
+        return get_serializer(salt).loads(token, max_age=max_age)
+    return get_serializer(salt, timed=False).loads(token)
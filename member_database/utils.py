@@ -1,3 +1,5 @@
+from functools import wraps
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.sql.expression import ClauseElement
 from flask import url_for, current_app
 from .models import db
@@ -38,6 +40,39 @@ def get_or_create(model, defaults=None, **kwargs):
         return instance, True
 
 
+def retry_on_integrity_error(func, max_tries=3):
+    """
+    Retry a database initialisation if it fails with a unique violation.
+
+    Multiple gunicorn workers run the first request hooks concurrently
+    and might try to insert the same rows, on retry they see the rows
+    committed by the other worker.
+    """
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        for attempt in range(1, max_tries + 1):
+            try:
+                return func(*args, **kwargs)
+            except IntegrityError:
+                db.session.rollback()
+                if attempt == max_tries:
+                    raise
+
+    return wrapper
+
+
+def background_request_context():
+    """
+    A request context for code running outside of requests, e.g. cli commands,
+    so that external urls can be built for mails.
+    """
+    scheme = "https" if current_app.config["USE_HTTPS"] else "http"
+    return current_app.test_request_context(
+        base_url=f"{scheme}://{current_app.config['EXTERNAL_SERVER_NAME']}"
+    )
+
+
 def ext_url_for(*args, **kwargs):
     return url_for(
         *args,
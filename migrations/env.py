@@ -29,6 +29,19 @@ config.set_main_option(
 )
 target_metadata = current_app.extensions["migrate"].db.metadata
 
+
+def include_object(object, name, type_, reflected, compare_to):
+    # indexes on registration data fields are created at runtime
+    from member_database.events.data_fields import INDEX_PREFIX
+
+    # the person search is created by raw ddl, not from the models
+    from member_database.models.search import SEARCH_PREFIX, TRGM_INDEX_PREFIX
+
+    if type_ == "table" and name.startswith(SEARCH_PREFIX):
+        return False
+    return not (type_ == "index" and name.startswith((INDEX_PREFIX, TRGM_INDEX_PREFIX)))
+
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -83,12 +96,19 @@ def run_migrations_online():
             connection=connection,
             target_metadata=target_metadata,
             process_revision_directives=process_revision_directives,
+            include_object=include_object,
             **current_app.extensions["migrate"].configure_args
         )
 
         with context.begin_transaction():
             context.run_migrations()
 
+            # batch migrations of the person table drop the sqlite search triggers
+            from member_database.models.search import ensure_search_triggers
+
+            if ensure_search_triggers(connection):
+                logger.info("Recreated the triggers of the person search index.")
+
 
 if context.is_offline_mode():
     run_migrations_offline()
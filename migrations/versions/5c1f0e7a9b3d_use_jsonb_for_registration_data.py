@@ -0,0 +1,50 @@
+"""Use jsonb for registration data on postgresql
+
+Revision ID: 5c1f0e7a9b3d
+Revises: 882fa4dc2df7
+Create Date: 2026-10-19 05:52:10.391847
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = "5c1f0e7a9b3d"
+down_revision = "882fa4dc2df7"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # sqlite uses expression indexes created per field at runtime
+    if op.get_bind().dialect.name != "postgresql":
+        return
+
+    op.alter_column(
+        "event_registration",
+        "data",
+        type_=postgresql.JSONB(),
+        postgresql_using="data::jsonb",
+    )
+    op.create_index(
+        "ix_event_registration_data_gin",
+        "event_registration",
+        ["data"],
+        postgresql_using="gin",
+        postgresql_ops={"data": "jsonb_path_ops"},
+    )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != "postgresql":
+        return
+
+    op.drop_index("ix_event_registration_data_gin", table_name="event_registration")
+    op.alter_column(
+        "event_registration",
+        "data",
+        type_=sa.JSON(),
+        postgresql_using="data::json",
+    )
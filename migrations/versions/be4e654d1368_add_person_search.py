@@ -0,0 +1,78 @@
+"""Add indexed person search
+
+Revision ID: be4e654d1368
+Revises: 2f4a00a008c6
+Create Date: 2026-10-19 06:10:41.512310
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "be4e654d1368"
+down_revision = "2f4a00a008c6"
+branch_labels = None
+depends_on = None
+
+
+SQLITE_UPGRADE = (
+    """CREATE VIRTUAL TABLE person_search USING fts5(
+        name, email, content='person', content_rowid='id', tokenize='trigram'
+    )""",
+    """CREATE TRIGGER person_search_insert AFTER INSERT ON person
+    BEGIN
+        INSERT INTO person_search(rowid, name, email)
+        VALUES (new.id, new.name, new.email);
+    END""",
+    """CREATE TRIGGER person_search_delete AFTER DELETE ON person
+    BEGIN
+        INSERT INTO person_search(person_search, rowid, name, email)
+        VALUES ('delete', old.id, old.name, old.email);
+    END""",
+    """CREATE TRIGGER person_search_update AFTER UPDATE OF name, email ON person
+    BEGIN
+        INSERT INTO person_search(person_search, rowid, name, email)
+        VALUES ('delete', old.id, old.name, old.email);
+        INSERT INTO person_search(rowid, name, email)
+        VALUES (new.id, new.name, new.email);
+    END""",
+    "INSERT INTO person_search(person_search) VALUES ('rebuild')",
+)
+
+SQLITE_DOWNGRADE = (
+    "DROP TRIGGER person_search_update",
+    "DROP TRIGGER person_search_delete",
+    "DROP TRIGGER person_search_insert",
+    "DROP TABLE person_search",
+)
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+
+    if dialect == "sqlite":
+        for statement in SQLITE_UPGRADE:
+            op.execute(statement)
+
+    elif dialect == "postgresql":
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        for column in ("name", "email"):
+            op.create_index(
+                f"ix_person_search_{column}",
+                "person",
+                [column],
+                postgresql_using="gin",
+                postgresql_ops={column: "gin_trgm_ops"},
+            )
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+
+    if dialect == "sqlite":
+        for statement in SQLITE_DOWNGRADE:
+            op.execute(statement)
+
+    elif dialect == "postgresql":
+        for column in ("name", "email"):
+            op.drop_index(f"ix_person_search_{column}", table_name="person")
@@ -2,11 +2,19 @@
 
 set -e
 
-# first backup!
-pg_dump "$DATABASE_URL" > /var/backups/$(date +"%Y-%m-%dT%H%M%S").sql
+# backup before changing the database, only needed if there are migrations
+flask backup --if-migrations-pending
 
 # apply database migrations
 flask db upgrade
 
+# regular backups in the background, the first one right away
+flask backup --every "${BACKUP_INTERVAL:-86400}" &
+
+# process event registrations in the background if intake mode is enabled
+if [ "$EVENT_REGISTRATION_INTAKE" = "true" ]; then
+	flask events process-intake --loop &
+fi
+
 # start the server
-gunicorn --bind 0.0.0.0:$PORT "member_database:create_app()"
+gunicorn --config gunicorn.conf.py "member_database:create_app()"
@@ -14,3 +14,9 @@ class TestingConfig(Config):
 
     # don't really send out mails
     MAIL_SUPPRESS_SEND = True
+
+    # tests send many requests from the same client,
+    # rate limiting is tested separately
+    RATELIMIT_ENABLED = False
+    # no buckets left over from earlier test runs
+    RATELIMIT_STORAGE = "memory"
@@ -0,0 +1,50 @@
+def add_persons(n):
+    from member_database.models import db, Person
+
+    for i in range(n):
+        db.session.add(Person(name=f"Counted {i}", email=f"counted{i}@example.org"))
+    db.session.commit()
+
+
+def test_estimated_count_query(client, app, monkeypatch):
+    from sqlalchemy import func
+    from member_database.models import db, Person
+    from member_database.models.counts import EstimatedCountQuery
+
+    add_persons(5)
+    n = Person.query.count()
+    query = EstimatedCountQuery(func.count("*"), db.session()).select_from(Person)
+    assert query.scalar() == n
+
+    # more rows than the limit: no count on sqlite, the pager has prev / next
+    monkeypatch.setitem(app.config, "ADMIN_EXACT_COUNT_LIMIT", n - 1)
+    assert query.scalar() is None
+    assert query.filter(Person.id == 1).scalar() == 1
+
+
+def test_admin_list_estimated_count(client, app, admin_user, monkeypatch):
+    from bs4 import BeautifulSoup
+    from member_database.models import Person
+    from tests.test_events import grant_access
+
+    grant_access(admin_user, "person_admin")
+    client.post("/login/", data=admin_user.login_data)
+    n = Person.query.count()
+
+    ret = client.get("/admin/person/?page_size=2")
+    assert ret.status_code == 200
+    soup = BeautifulSoup(ret.data.decode("utf-8"), "html.parser")
+    assert f"({n})" in soup.find("a", {"class": "nav-link active"}).text
+
+    assert n > 4
+    monkeypatch.setitem(app.config, "ADMIN_EXACT_COUNT_LIMIT", 2)
+    ret = client.get("/admin/person/?page_size=2&page=1")
+    assert ret.status_code == 200
+    soup = BeautifulSoup(ret.data.decode("utf-8"), "html.parser")
+    assert f"({n})" not in soup.find("a", {"class": "nav-link active"}).text
+    # simple pager: only previous and next
+    pagination = soup.find("ul", {"class": "pagination"})
+    assert len(pagination.find_all("li")) == 2
+    assert len(soup.find_all("input", {"name": "rowid"})) == 2
+
+    client.get("/logout")
@@ -0,0 +1,49 @@
+import gzip
+import sqlite3
+
+
+def test_backup(app, client, tmp_path):
+    from member_database.backup import create_backup, apply_retention
+
+    path = create_backup(tmp_path)
+    assert path.name.startswith("memberdb-")
+    assert path.name.endswith(".sqlite.gz")
+
+    # check the backup is a usable database
+    restored = tmp_path / "restored.sqlite"
+    with gzip.open(path) as f:
+        restored.write_bytes(f.read())
+    con = sqlite3.connect(restored)
+    assert con.execute("SELECT count(*) FROM person").fetchone()[0] > 0
+    con.close()
+
+    # no temporary files are left behind
+    assert len(list(tmp_path.glob(".*"))) == 0
+
+    (tmp_path / "memberdb-2000-01-01T000000.sqlite.gz").touch()
+    (tmp_path / "memberdb-2001-01-01T000000.sqlite.gz").touch()
+    removed = apply_retention(tmp_path, keep=2)
+    assert [p.name for p in removed] == ["memberdb-2000-01-01T000000.sqlite.gz"]
+    assert path.exists()
+
+
+def test_backup_command(app, client, tmp_path):
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=["backup", "--directory", str(tmp_path), "--keep", "1"])
+    assert result.exit_code == 0, result.output
+    assert len(list(tmp_path.glob("memberdb-*"))) == 1
+
+
+def test_migrations_pending(app, client, tmp_path):
+    from member_database.backup import migrations_pending
+
+    # the app was not created by the flask cli, migrate is set up anyway
+    assert "migrate" in app.extensions
+    # the test database was created without migrations
+    assert migrations_pending()
+
+    runner = app.test_cli_runner()
+    args = ["backup", "--directory", str(tmp_path), "--if-migrations-pending"]
+    result = runner.invoke(args=args)
+    assert result.exit_code == 0, result.output
+    assert len(list(tmp_path.glob("memberdb-*"))) == 1
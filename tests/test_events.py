@@ -78,3 +78,749 @@ def test_event(client):
     alert = s.find("div", {"class": "alert alert-warning"})
     assert alert
     assert "Warteliste" in alert.text
+
+
+def grant_access(user, *names):
+    from member_database import db
+    from member_database.authentication import AccessLevel
+    from member_database.utils import get_or_create
+
+    role = user.roles[0]
+    for name in names:
+        level, _ = get_or_create(AccessLevel, id=name)
+        if level not in role.access_levels:
+            role.access_levels.append(level)
+    db.session.commit()
+
+
+def test_participants(client, admin_user):
+    grant_access(admin_user, "get_participants")
+    client.post("/login/", data=admin_user.login_data)
+
+    ret = client.get("/events/1/participants/?per_page=1")
+    assert ret.status_code == 200
+    soup = BeautifulSoup(ret.data.decode("utf-8"), "html.parser")
+    assert len(soup.find("tbody").find_all("tr")) == 1
+    assert soup.find("ul", {"class": "pagination"})
+
+    ret = client.get("/events/1/participants/", headers={"Accept": "application/json"})
+    assert ret.status_code == 200
+    assert len(ret.json["participants"]) == 2
+
+    ret = client.get("/events/1/participants.csv")
+    assert ret.status_code == 200
+    assert ret.mimetype == "text/csv"
+    lines = ret.data.decode("utf-8-sig").splitlines()
+    assert lines[0] == "#,name,email,semester,course,status"
+    assert lines[1] == "1,Test User,test1@example.org,1,Physik,confirmed"
+    assert len(lines) == 3
+
+    assert client.get("/events/42/participants.csv").status_code == 404
+
+    # user input is not run as formula by spreadsheet programs
+    from member_database import db
+    from member_database.events import Event, EventRegistration
+    from member_database.models import Person
+
+    event = Event(name="CSV Event", registration_schema={})
+    db.session.add(
+        EventRegistration(
+            event=event,
+            person=Person(name="CSV Person", email="@csv@example.org"),
+            status_name="confirmed",
+            data={"name": '=HYPERLINK("https://evil.example","x")'},
+        )
+    )
+    db.session.commit()
+    ret = client.get(f"/events/{event.id}/participants.csv")
+    lines = ret.data.decode("utf-8-sig").splitlines()
+    assert lines[1] == (
+        '1,"\'=HYPERLINK(""https://evil.example"",""x"")",\'@csv@example.org,confirmed'
+    )
+
+    client.get("/logout")
+
+
+def test_waitinglist_promotion(app, client):
+    from member_database import db
+    from member_database.events import (
+        Event,
+        EventRegistration,
+        promote_waitinglist,
+        registration_token,
+    )
+
+    event = Event.query.get(1)
+    waiting = EventRegistration.query.filter_by(
+        event_id=event.id, status_name="waitinglist"
+    ).one()
+
+    with app.test_request_context():
+        token = registration_token(waiting)
+
+    ret = client.get(f"/events/registration/{token}/position/")
+    assert ret.status_code == 200
+    assert ret.json["position"] == 1
+
+    # no free places, nothing to promote
+    assert promote_waitinglist(event) == []
+
+    event.max_participants = 2
+    promoted = promote_waitinglist(event)
+    db.session.commit()
+    assert promoted == [waiting]
+    assert waiting.status_name == "confirmed"
+
+    ret = client.get(f"/events/registration/{token}/position/")
+    assert ret.json["registration_status"] == "confirmed"
+    assert ret.json["position"] is None
+
+    assert client.get("/events/registration/invalid/position/").status_code == 404
+
+
+def test_waitinglist_order_without_timestamp(client):
+    from datetime import datetime, timezone
+    from member_database import db
+    from member_database.events import (
+        Event,
+        EventRegistration,
+        get_waitinglist_position,
+        promote_waitinglist,
+    )
+    from member_database.models import Person
+
+    event = Event(name="Old Event", max_participants=1, registration_schema={})
+    timestamps = [None, datetime(2020, 1, 2, tzinfo=timezone.utc), None]
+    registrations = [
+        EventRegistration(
+            event=event,
+            person=Person(name=f"Old {i}", email=f"old{i}@example.org"),
+            status_name="waitinglist",
+            data={},
+            timestamp=timestamp,
+        )
+        for i, timestamp in enumerate(timestamps)
+    ]
+    db.session.add_all(registrations)
+    db.session.commit()
+
+    # registrations without timestamp come last, on every database
+    positions = [get_waitinglist_position(r) for r in registrations]
+    assert positions == [2, 1, 3]
+    assert promote_waitinglist(event) == [registrations[1]]
+    db.session.commit()
+    assert get_waitinglist_position(registrations[0]) == 1
+    assert get_waitinglist_position(registrations[2]) == 2
+
+
+def test_resend_emails(client):
+    from member_database import db
+    from member_database.events import Event, EventRegistration
+    from member_database.models import Person
+    from member_database.mail import mail
+
+    person = Person.query.filter_by(email="test1@example.org").one()
+    other = Event(
+        name="Other Event",
+        registration_open=True,
+        registration_schema={"properties": {}},
+    )
+    db.session.add(other)
+    db.session.add(
+        EventRegistration(event=other, person=person, status_name="pending", data={})
+    )
+    db.session.commit()
+
+    with mail.record_messages() as outbox:
+        ret = client.post(
+            "/events/resend_emails/",
+            data={"email": person.email},
+            follow_redirects=True,
+        )
+        assert ret.status_code == 200
+
+    # a single mail with links to both registrations
+    assert len(outbox) == 1
+    assert outbox[0].recipients == [person.email]
+    assert "Test Event" in outbox[0].body
+    assert "Other Event" in outbox[0].body
+    links = re.findall(r"http(s)?:\/\/.*events\/registration\/.*", outbox[0].body)
+    assert len(links) == 2
+
+    with mail.record_messages() as outbox:
+        ret = client.post(
+            "/events/resend_emails/",
+            data={"email": "unknown@example.org"},
+            follow_redirects=True,
+        )
+        assert "Keine Veranstaltungs-Anmeldung" in ret.data.decode("utf-8")
+    assert len(outbox) == 0
+
+
+def test_registration_intake(app, client, monkeypatch):
+    from importlib import import_module
+    from member_database import db
+    from member_database.events import (
+        Event,
+        EventRegistration,
+        RegistrationIntake,
+        process_intake,
+    )
+    from member_database.mail import mail
+
+    event = Event(
+        name="Intake Event",
+        registration_open=True,
+        registration_schema={
+            "properties": {"semester": {"type": "integer", "label": "Semester"}},
+        },
+    )
+    db.session.add(event)
+    db.session.commit()
+
+    app.config["EVENT_REGISTRATION_INTAKE"] = True
+    try:
+        with mail.record_messages() as outbox:
+            for email in ("intake1@example.org", "test1@example.org"):
+                ret = client.post(
+                    f"/events/{event.id}/registration/",
+                    data={"semester": 3, "email": email, "name": "Intake User"},
+                )
+                assert ret.status_code == 302
+    finally:
+        app.config["EVENT_REGISTRATION_INTAKE"] = False
+
+    # nothing happened yet besides storing the submissions
+    assert len(outbox) == 0
+    assert RegistrationIntake.query.count() == 2
+    assert EventRegistration.query.filter_by(event_id=event.id).count() == 0
+
+    # the mails of a batch share one smtp connection
+    mail_module = import_module("member_database.mail")
+    batches = []
+    send_batch = mail_module.send_batch
+    monkeypatch.setattr(
+        mail_module, "send_batch", lambda b: batches.append(len(b)) or send_batch(b)
+    )
+    with mail.record_messages() as outbox:
+        assert process_intake(batch_size=10) == 2
+    assert batches == [2]
+
+    assert RegistrationIntake.query.count() == 0
+    registrations = EventRegistration.query.filter_by(event_id=event.id).all()
+    assert len(registrations) == 2
+    assert all(r.status_name == "pending" for r in registrations)
+    assert {r.data["semester"] for r in registrations} == {3}
+
+    assert sorted(m.recipients[0] for m in outbox) == [
+        "intake1@example.org",
+        "test1@example.org",
+    ]
+    assert "Intake Event" in outbox[0].subject
+
+    assert process_intake() == 0
+
+
+def test_participants_filter(client, admin_user):
+    from member_database import db
+    from member_database.events import Event, EventRegistration
+    from member_database.events.data_fields import (
+        create_data_indexes,
+        data_equals,
+        index_name,
+    )
+    from member_database.models import Person
+
+    event = Event(
+        name="Absolventenfeier",
+        registration_schema={
+            "properties": {
+                "degree": {"type": "string", "enum": ["Bachelor", "Master"]},
+                "chair": {"type": "string"},
+                "guests": {"type": "integer"},
+            },
+        },
+    )
+    db.session.add(event)
+    for i, (degree, chair, guests) in enumerate(
+        [
+            ("Master", "E5", 2),
+            ("Bachelor", "E5", 1),
+            ("Master", "T3", 3),
+            ("Master", "E5", 4),
+        ]
+    ):
+        person = Person(name=f"Graduate {i}", email=f"graduate{i}@example.org")
+        db.session.add(
+            EventRegistration(
+                event=event,
+                person=person,
+                status_name="confirmed",
+                data=dict(name=person.name, degree=degree, chair=chair, guests=guests),
+            )
+        )
+    db.session.commit()
+    sqlite = db.engine.dialect.name == "sqlite"
+    indexes = create_data_indexes(event)
+    db.session.commit()
+    assert (index_name("degree") in indexes) == sqlite
+
+    client.post("/login/", data=admin_user.login_data)
+    url = f"/events/{event.id}/participants/"
+    json = {"Accept": "application/json"}
+
+    ret = client.get(url + "?degree=Master&chair=E5&sort=-guests", headers=json)
+    assert ret.status_code == 200
+    assert [p["data"]["guests"] for p in ret.json["participants"]] == [4, 2]
+
+    ret = client.get(url + "?guests=1&guests=3&sort=guests", headers=json)
+    assert [p["data"]["guests"] for p in ret.json["participants"]] == [1, 3]
+
+    # the empty "all" option of the filter form
+    ret = client.get(url + "?degree=&sort=", headers=json)
+    assert len(ret.json["participants"]) == 4
+
+    ret = client.get(url + "?degree=Master")
+    assert ret.status_code == 200
+    soup = BeautifulSoup(ret.data.decode("utf-8"), "html.parser")
+    assert len(soup.find("tbody").find_all("tr")) == 3
+
+    ret = client.get(f"/events/{event.id}/participants.csv?degree=Bachelor")
+    assert len(ret.data.decode("utf-8-sig").splitlines()) == 2
+
+    assert client.get(url + "?sort=password", headers=json).status_code == 400
+    assert client.get(url + "?guests=many", headers=json).status_code == 400
+
+    client.get("/logout")
+
+    # on sqlite, the filter uses the expression index
+    if sqlite:
+        query = EventRegistration.query.filter_by(event_id=event.id).filter(
+            data_equals("degree", "Master")
+        )
+        sql = str(query.statement.compile(compile_kwargs={"literal_binds": True}))
+        plan = db.session.execute(db.text("EXPLAIN QUERY PLAN " + sql)).fetchall()
+        assert "ix_event_registration_data_degree" in str(plan)
+
+
+def test_data_index_names(app, client):
+    from sqlalchemy import text
+    from member_database import db
+    from member_database.events import Event
+    from member_database.events.data_fields import create_data_indexes, index_name
+
+    fields = ["Degree", "degree", "e-mail", "e_mail"]
+    assert len({index_name(field) for field in fields}) == 4
+
+    event = Event(
+        name="Index Event",
+        registration_schema={"properties": {f: {"type": "string"} for f in fields}},
+    )
+    db.session.add(event)
+    db.session.commit()
+    if db.engine.dialect.name != "sqlite":
+        assert create_data_indexes(event) == []
+        return
+
+    # indexes of an older naming are dropped by the command
+    db.session.execute(
+        text(
+            "CREATE INDEX ix_event_registration_data_degree"
+            " ON event_registration (event_id)"
+        )
+    )
+    db.session.commit()
+    result = app.test_cli_runner().invoke(args=["events", "create-data-indexes"])
+    assert result.exit_code == 0, result.output
+    assert "dropped ix_event_registration_data_degree\n" in result.output
+
+    names = set(
+        db.session.execute(
+            text("SELECT name FROM sqlite_master WHERE type = 'index'")
+        ).scalars()
+    )
+    assert {index_name(field) for field in fields} <= names
+    assert "ix_event_registration_data_degree" not in names
+
+
+def test_event_stats(app, client, admin_user, monkeypatch):
+    from datetime import datetime, timezone
+    from sqlalchemy import update
+    from member_database import db
+    from member_database.events import Event, EventRegistration
+    from member_database.events.stats import _cache
+
+    event = Event.query.filter_by(name="Absolventenfeier").one()
+    event.registration_schema = {
+        **event.registration_schema,
+        "properties": {
+            **event.registration_schema["properties"],
+            "vegetarian": {"type": "boolean"},
+        },
+    }
+    for i, registration in enumerate(event.registrations):
+        registration.data["vegetarian"] = i % 2 == 0
+        registration.timestamp = datetime(2022, 6, 1, 12 + i // 2, tzinfo=timezone.utc)
+    db.session.commit()
+
+    client.post("/login/", data=admin_user.login_data)
+    ret = client.get(f"/events/{event.id}/stats/")
+    assert ret.status_code == 200
+    stats = ret.json["stats"]
+    assert stats["registrations"] == 4
+    fields = stats["fields"]
+    assert fields["degree"]["counts"] == {"Master": 3, "Bachelor": 1}
+    assert fields["chair"]["counts"] == {"E5": 3, "T3": 1}
+    assert fields["guests"]["sum"] == 10
+    assert fields["guests"]["histogram"] == [
+        {"value": v, "count": 1} for v in (1, 2, 3, 4)
+    ]
+    assert fields["vegetarian"]["true"] == 2
+    assert fields["vegetarian"]["ratio"] == 0.5
+    assert stats["timeline"] == [
+        {"hour": "2022-06-01T12:00:00+00:00", "registrations": 2},
+        {"hour": "2022-06-01T13:00:00+00:00", "registrations": 2},
+    ]
+
+    # cached until a registration changes
+    registration = event.registrations[0]
+    expected = 10 - registration.data["guests"] + 12
+    registration.data["guests"] = 12
+    db.session.commit()
+    ret = client.get(f"/events/{event.id}/stats/")
+    assert ret.json["stats"]["fields"]["guests"]["sum"] == expected
+
+    registration.status_name = "canceled"
+    db.session.commit()
+    ret = client.get(f"/events/{event.id}/stats/")
+    assert ret.json["stats"]["registrations"] == 3
+    ret = client.get(f"/events/{event.id}/stats/?status=confirmed,canceled")
+    assert ret.json["stats"]["registrations"] == 4
+
+    # an edit by another worker does not change the fingerprint,
+    # the cached result is used until it expires
+    other = event.registrations[1]
+    sum_before = client.get(f"/events/{event.id}/stats/").json["stats"]["fields"][
+        "guests"
+    ]["sum"]
+    db.session.execute(
+        update(EventRegistration)
+        .where(EventRegistration.id == other.id)
+        .values(data={**other.data, "guests": other.data["guests"] + 100})
+    )
+    db.session.commit()
+    ret = client.get(f"/events/{event.id}/stats/")
+    assert ret.json["stats"]["fields"]["guests"]["sum"] == sum_before
+    monkeypatch.setitem(app.config, "STATS_CACHE_TTL", 0)
+    ret = client.get(f"/events/{event.id}/stats/")
+    assert ret.json["stats"]["fields"]["guests"]["sum"] == sum_before + 100
+
+    ret = client.get(f"/events/{event.id}/stats/?status=confirmed,foo")
+    assert ret.status_code == 400
+
+    monkeypatch.setitem(app.config, "STATS_CACHE_SIZE", 1)
+    client.get(f"/events/{event.id}/stats/?status=canceled")
+    client.get(f"/events/{event.id}/stats/?status=pending")
+    assert list(_cache) == [(event.id, ("pending",))]
+
+    client.get("/logout")
+
+
+def test_gdpr_data_export(client):
+    from sqlalchemy import event as sa_event
+    from member_database import db
+    from member_database.events import EventRegistration
+    from member_database.mail import mail
+
+    email = "test1@example.org"
+    with mail.record_messages() as outbox:
+        client.post("/request_gdpr_data", data={"email": email})
+    link = re.search(r"http(s)?:\/\/.*view_data\/.*", outbox[0].body).group(0)
+
+    statements = []
+
+    def count(*args):
+        statements.append(args[2])
+
+    sa_event.listen(db.engine, "before_cursor_execute", count)
+    try:
+        ret = client.get(link)
+    finally:
+        sa_event.remove(db.engine, "before_cursor_execute", count)
+
+    assert ret.status_code == 200
+    # person with live registrations, archived registrations
+    assert len(statements) == 2
+    assert "JOIN archived_event_registration" not in statements[0]
+
+    data = ret.json
+    assert data["personal_data"]["email"] == email
+    registrations = data["personal_data"]["event_registrations"]
+    n_registrations = (
+        EventRegistration.query.join(EventRegistration.person)
+        .filter_by(email=email)
+        .count()
+    )
+    assert len(registrations) == n_registrations > 1
+    event_ids = [event["id"] for event in data["events"]]
+    assert sorted(event_ids) == sorted({r["event_id"] for r in registrations})
+
+
+def test_archive_event(app, client, admin_user):
+    import json
+    import pytest
+    from member_database import db
+    from member_database.events import (
+        Event,
+        EventRegistration,
+        ArchivedEventRegistration,
+        archive_event,
+        registration_token,
+    )
+    from member_database.models import Person
+
+    event = Event(
+        name="Sommerfest 2019",
+        registration_schema={"properties": {"drink": {"type": "string"}}},
+    )
+    db.session.add(event)
+    for i, (status, drink) in enumerate(
+        [("confirmed", "Mate"), ("confirmed", "Bier"), ("waitinglist", "Mate")]
+    ):
+        person = Person(name=f"Summer {i}", email=f"summer{i}@example.org")
+        db.session.add(
+            EventRegistration(
+                event=event,
+                person=person,
+                status_name=status,
+                data=dict(name=person.name, drink=drink),
+            )
+        )
+    db.session.commit()
+    event_id = event.id
+    with app.test_request_context():
+        token = registration_token(event.registrations[0])
+
+    grant_access(admin_user, "event_admin")
+    client.post("/login/", data=admin_user.login_data)
+    assert "Sommerfest 2019" in client.get("/events/").data.decode("utf-8")
+
+    result = app.test_cli_runner().invoke(args=["events", "archive", str(event_id)])
+    assert result.exit_code == 0, result.output
+    assert "archived 3" in result.output
+
+    event = db.session.get(Event, event_id)
+    assert event.archived_at is not None
+    assert event.registration_counts == {"confirmed": 2, "waitinglist": 1}
+    assert EventRegistration.query.filter_by(event_id=event_id).count() == 0
+    assert ArchivedEventRegistration.query.filter_by(event_id=event_id).count() == 3
+    with pytest.raises(ValueError):
+        archive_event(event)
+
+    # old confirmation links of archived registrations
+    ret = client.get(f"/events/registration/{token}/")
+    assert ret.status_code == 404
+    assert "Anmeldung nicht mehr vorhanden" in ret.data.decode("utf-8")
+
+    # archived events cannot be opened again, neither inline nor in the form
+    ret = client.post(
+        "/admin/event/ajax/update/",
+        data={"list_form_pk": event_id, "registration_open": "y"},
+    )
+    assert ret.status_code == 500
+    assert "Archivierte Veranstaltungen" in ret.data.decode("utf-8")
+    ret = client.post(
+        f"/admin/event/edit/?id={event_id}",
+        data={
+            "name": "Sommerfest 2019",
+            "registration_schema": json.dumps(event.registration_schema),
+            "registration_open": "y",
+        },
+        follow_redirects=True,
+    )
+    assert "Archivierte Veranstaltungen" in ret.data.decode("utf-8")
+    db.session.expire_all()
+    assert not db.session.get(Event, event_id).registration_open
+
+    # archived events are only listed in the history
+    assert "Sommerfest 2019" not in client.get("/events/").data.decode("utf-8")
+    ret = client.get("/events/archive/")
+    assert ret.status_code == 200
+    soup = BeautifulSoup(ret.data.decode("utf-8"), "html.parser")
+    row = next(tr for tr in soup.find_all("tr") if "Sommerfest 2019" in tr.text)
+    assert [td.text for td in row.find_all("td")][2:5] == ["2", "1", "0"]
+
+    # participants and statistics are read from the archive
+    ret = client.get(
+        f"/events/{event_id}/participants/?drink=Mate&sort=-timestamp",
+        headers={"Accept": "application/json"},
+    )
+    assert ret.status_code == 200
+    assert len(ret.json["participants"]) == 2
+    ret = client.get(f"/events/{event_id}/stats/")
+    assert ret.json["stats"]["fields"]["drink"]["counts"] == {"Bier": 1, "Mate": 1}
+
+    result = app.test_cli_runner().invoke(
+        args=["events", "archive", "--restore", str(event_id)]
+    )
+    assert result.exit_code == 0, result.output
+    event = db.session.get(Event, event_id)
+    assert event.archived_at is None
+    assert EventRegistration.query.filter_by(event_id=event_id).count() == 3
+    assert ArchivedEventRegistration.query.filter_by(event_id=event_id).count() == 0
+
+    client.get("/logout")
+
+
+def test_admin_bulk_actions(client, admin_user):
+    from datetime import datetime, timedelta, timezone
+    from member_database import db
+    from member_database.events import Event, EventRegistration
+    from member_database.mail import mail
+    from member_database.models import Person
+
+    grant_access(admin_user, "event_admin", "event_registration_admin")
+    events = [
+        Event(
+            name=f"Bulk Event {i}",
+            max_participants=2,
+            registration_open=False,
+            registration_schema={},
+        )
+        for i in range(2)
+    ]
+    db.session.add_all(events)
+    start = datetime(2023, 1, 1, tzinfo=timezone.utc)
+    for i, status in enumerate(
+        ["confirmed", "confirmed", "waitinglist", "waitinglist"]
+    ):
+        person = Person(name=f"Bulk {i}", email=f"bulk{i}@example.org")
+        db.session.add(
+            EventRegistration(
+                event=events[0],
+                person=person,
+                status_name=status,
+                data={},
+                timestamp=start + timedelta(minutes=i),
+            )
+        )
+    db.session.commit()
+    event_id = events[0].id
+    registrations = sorted(events[0].registrations, key=lambda r: r.timestamp)
+    ids = [r.id for r in registrations]
+
+    client.post("/login/", data=admin_user.login_data)
+    ret = client.get(f"/events/{event_id}/stats/")
+    assert ret.json["stats"]["registrations"] == 2
+
+    ret = client.post(
+        "/admin/event/action/",
+        data={"action": "open", "rowid": [e.id for e in events]},
+    )
+    assert ret.status_code == 302
+    db.session.expire_all()
+    assert all(db.session.get(Event, e.id).registration_open for e in events)
+
+    # canceling both confirmed registrations promotes the waiting list
+    with mail.record_messages() as outbox:
+        ret = client.post(
+            "/admin/eventregistration/action/",
+            data={"action": "status_canceled", "rowid": ids[:2]},
+        )
+    assert ret.status_code == 302
+    db.session.expire_all()
+    statuses = [db.session.get(EventRegistration, i).status_name for i in ids]
+    assert statuses == ["canceled", "canceled", "confirmed", "confirmed"]
+    assert sorted(m.recipients[0] for m in outbox) == [
+        "bulk2@example.org",
+        "bulk3@example.org",
+    ]
+
+    # the cached statistics were invalidated
+    ret = client.get(f"/events/{event_id}/stats/?status=canceled")
+    assert ret.json["stats"]["registrations"] == 2
+
+    # registrations put on the waiting list of an unlimited event stay there
+    unlimited = db.session.get(Event, events[1].id)
+    unlimited.max_participants = None
+    registration = EventRegistration(
+        event=unlimited,
+        person=Person(name="Bulk 4", email="bulk4@example.org"),
+        status_name="confirmed",
+        data={},
+    )
+    db.session.add(registration)
+    db.session.commit()
+    registration_id = registration.id
+    with mail.record_messages() as outbox:
+        ret = client.post(
+            "/admin/eventregistration/action/",
+            data={"action": "status_waitinglist", "rowid": [registration_id]},
+        )
+    assert ret.status_code == 302
+    db.session.expire_all()
+    registration = db.session.get(EventRegistration, registration_id)
+    assert registration.status_name == "waitinglist"
+    assert outbox == []
+
+    ret = client.post(
+        "/admin/event/action/",
+        data={"action": "close", "rowid": [e.id for e in events]},
+    )
+    db.session.expire_all()
+    assert not any(db.session.get(Event, e.id).registration_open for e in events)
+
+    client.get("/logout")
+
+
+def test_write_mail_personalised(app, client, admin_user, monkeypatch):
+    from member_database.models import db, Person
+    from member_database.events import Event, EventRegistration
+    from member_database.mail import mail
+
+    grant_access(admin_user, "write_email")
+    event = Event(name="Merge Event", registration_schema={})
+    for i in range(5):
+        db.session.add(
+            EventRegistration(
+                event=event,
+                person=Person(name=f"Merge {i}", email=f"merge{i}@example.org"),
+                status_name="confirmed" if i < 4 else "canceled",
+                data={"food": f"dish {i}"},
+            )
+        )
+    db.session.commit()
+    monkeypatch.setitem(app.config, "MAIL_BATCH_SIZE", 3)
+
+    client.post("/login/", data=admin_user.login_data)
+    url = f"/events/{event.id}/write_mail/"
+    data = dict(
+        name="Richard Feynman",
+        email="rfeynman@example.org",
+        subject="Essen",
+        personalised="y",
+    )
+
+    with mail.record_messages() as outbox:
+        ret = client.post(url, data=dict(data, body="Hallo {{ name }"))
+        assert "Fehler im Template" in ret.data.decode("utf-8")
+
+        # the sandbox does not allow access to internals
+        body = "{{ data.__class__.__subclasses__() }}"
+        ret = client.post(url, data=dict(data, body=body))
+        assert "Fehler im Template" in ret.data.decode("utf-8")
+        assert outbox == []
+
+        body = "Hallo {{ name }}, du isst {{ data.food }} bei {{ event }}.\n"
+        body += "{{ confirmation_link }}"
+        ret = client.post(url, data=dict(data, body=body))
+        assert ret.status_code == 302
+
+    assert len(outbox) == 4
+    messages = sorted(outbox, key=lambda m: m.recipients[0])
+    assert messages[1].recipients == ["Merge 1 <merge1@example.org>"]
+    assert messages[1].body.startswith("Hallo Merge 1, du isst dish 1 bei Merge Event.")
+    assert "/events/registration/" in messages[1].body
+    assert messages[1].reply_to == "Richard Feynman <rfeynman@example.org>"
+
+    client.get("/logout")
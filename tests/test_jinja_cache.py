@@ -0,0 +1,32 @@
+from concurrent.futures import ThreadPoolExecutor
+
+
+def test_jinja_cache_dir(tmp_path):
+    from config import TestingConfig
+    from member_database import create_app
+    from member_database.models import db
+
+    cache_dir = tmp_path / "jinja" / "cache"
+
+    class CacheConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'cache.sqlite'}"
+        JINJA_CACHE_DIR = str(cache_dir)
+
+    app = create_app(CacheConfig)
+    assert cache_dir.is_dir()
+
+    def render():
+        with app.app_context():
+            db.create_all()
+            try:
+                return app.test_client().get("/events/resend_emails/").status_code
+            finally:
+                db.engine.dispose()
+
+    # the database session is scoped to the thread, a separate thread keeps
+    # the teardown of this app from removing the session of the other tests
+    with ThreadPoolExecutor(1) as executor:
+        assert executor.submit(render).result() == 200
+
+    # the compiled templates were written to the cache
+    assert any(cache_dir.iterdir())
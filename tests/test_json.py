@@ -0,0 +1,37 @@
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+import pytest
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_dumps(use_orjson, monkeypatch):
+    from member_database import json
+
+    if not use_orjson:
+        monkeypatch.setattr(json, "orjson", None)
+    elif json.orjson is None:
+        pytest.skip("orjson not installed")
+
+    data = {
+        "timestamp": datetime(2022, 7, 1, 12, 30, tzinfo=timezone.utc),
+        "date": date(2022, 7, 1),
+        "guests": Decimal("2"),
+        "name": "Jürgen",
+    }
+    assert json.loads(json.dumps(data)) == {
+        "timestamp": "2022-07-01T12:30:00+00:00",
+        "date": "2022-07-01",
+        "guests": 2.0,
+        "name": "Jürgen",
+    }
+    assert json.dumps({"b": 1, "a": 2}, sort_keys=True).index('"a"') == 1
+
+    with pytest.raises(TypeError):
+        json.dumps({"foo": object()})
+
+
+def test_json_provider(app):
+    with app.test_request_context():
+        response = app.json.response(timestamp=date(2022, 7, 1))
+    assert response.json == {"timestamp": "2022-07-01"}
@@ -0,0 +1,67 @@
+from collections import deque
+import smtplib
+
+import pytest
+
+
+def make_messages(n):
+    from member_database.mail import Message
+
+    return [
+        Message(
+            subject="Batch",
+            sender="sender@example.org",
+            recipients=[f"batch{i}@example.org"],
+            body=str(i),
+        )
+        for i in range(n)
+    ]
+
+
+def test_send_batch_skips_refused(client, monkeypatch):
+    from member_database.mail import mail, send_batch, TimeoutConnection
+
+    send = TimeoutConnection.send
+
+    def refuse_batch1(self, message, *args, **kwargs):
+        if message.recipients == ["batch1@example.org"]:
+            raise smtplib.SMTPRecipientsRefused(
+                {"batch1@example.org": (550, b"No such user")}
+            )
+        return send(self, message, *args, **kwargs)
+
+    monkeypatch.setattr(TimeoutConnection, "send", refuse_batch1)
+
+    messages = deque(make_messages(3))
+    with mail.record_messages() as outbox:
+        send_batch(messages)
+
+    assert not messages
+    assert [m.recipients[0] for m in outbox] == [
+        "batch0@example.org",
+        "batch2@example.org",
+    ]
+
+
+def test_send_batch_gives_up_on_smtp_errors(client, monkeypatch):
+    from member_database.mail import is_permanent, send_batch, TimeoutConnection
+
+    calls = []
+
+    def refuse_sender(self, message, *args, **kwargs):
+        calls.append(message)
+        raise smtplib.SMTPSenderRefused(553, b"Not allowed", message.sender)
+
+    monkeypatch.setattr(TimeoutConnection, "send", refuse_sender)
+
+    # raised at once instead of retrying for a day
+    messages = deque(make_messages(2))
+    with pytest.raises(smtplib.SMTPSenderRefused):
+        send_batch(messages)
+    assert len(calls) == 1
+    assert len(messages) == 2
+
+    assert not is_permanent(ConnectionResetError())
+    assert not is_permanent(smtplib.SMTPServerDisconnected())
+    assert not is_permanent(smtplib.SMTPResponseException(421, b"Try again"))
+    assert is_permanent(smtplib.SMTPAuthenticationError(535, b"Wrong password"))
@@ -0,0 +1,120 @@
+def test_admin_list_eager_loading(client, admin_user):
+    from sqlalchemy import event as sa_event
+    from member_database.models import db, Person
+    from member_database.events import Event, EventRegistration
+    from tests.test_events import grant_access
+
+    client.get("/events/")
+    grant_access(admin_user, "person_admin")
+    event = Event(name="Eager Event", registration_schema={})
+    for i in range(30):
+        person = Person(name=f"Eager {i}", email=f"eager{i}@example.org")
+        db.session.add(
+            EventRegistration(
+                event=event, person=person, status_name="confirmed", data={}
+            )
+        )
+    db.session.commit()
+    client.post("/login/", data=admin_user.login_data)
+
+    statements = []
+
+    def count(*args):
+        statements.append(args[2])
+
+    sa_event.listen(db.engine, "before_cursor_execute", count)
+    try:
+        ret = client.get("/admin/person/?search=eager&page_size=50")
+    finally:
+        sa_event.remove(db.engine, "before_cursor_execute", count)
+
+    assert ret.status_code == 200
+    assert ret.data.decode("utf-8").count("Eager ") >= 30
+    # not one query per listed person
+    assert len(statements) < 15
+
+    client.get("/logout")
+
+
+def test_admin_ajax_refs(client, admin_user):
+    from member_database.models import Person
+    from member_database.events import EventRegistration
+    from tests.test_events import grant_access
+
+    grant_access(admin_user, "event_registration_admin", "user_admin")
+    client.post("/login/", data=admin_user.login_data)
+
+    registration = (
+        EventRegistration.query.join(Person)
+        .filter(Person.email == "eager1@example.org")
+        .one()
+    )
+    ret = client.get(f"/admin/eventregistration/edit/?id={registration.id}")
+    assert ret.status_code == 200
+    text = ret.data.decode("utf-8")
+    # the form does not contain all persons
+    assert "Eager 2" not in text
+    assert "data-url" in text
+
+    person = Person.query.filter_by(email="eager2@example.org").one()
+    ret = client.get("/admin/eventregistration/ajax/lookup/?name=person&query=eager2@")
+    assert ret.status_code == 200
+    assert ret.json == [[person.id, str(person)]]
+
+    ret = client.get("/admin/eventregistration/ajax/lookup/?name=event&query=Eager")
+    assert [name for _, name in ret.json] == [str(registration.event)]
+
+    ret = client.get("/admin/user/ajax/lookup/?name=person&query=~Feinman")
+    assert "Richard Feynman" in ret.data.decode("utf-8")
+
+    client.get("/logout")
+
+
+def test_admin_membership_action(client, admin_user):
+    from datetime import date
+    from member_database.models import db, Person, MembershipStatus
+    from member_database.mail import mail
+    from tests.test_events import grant_access
+
+    grant_access(admin_user, "person_admin")
+    persons = [
+        Person(
+            name=f"Applicant {i}",
+            email=f"applicant{i}@example.org",
+            membership_status_id=status,
+            joining_date=joining_date,
+        )
+        for i, (status, joining_date) in enumerate(
+            [
+                (MembershipStatus.PENDING, None),
+                (MembershipStatus.PENDING, None),
+                (MembershipStatus.CONFIRMED, date(2020, 1, 1)),
+            ]
+        )
+    ]
+    db.session.add_all(persons)
+    db.session.commit()
+    ids = [p.id for p in persons]
+    before = db.session.get(Person, ids[0]).status_changed_at
+
+    client.post("/login/", data=admin_user.login_data)
+    with mail.record_messages() as outbox:
+        ret = client.post(
+            "/admin/person/action/",
+            data={"action": "membership_confirmed", "rowid": ids},
+        )
+    assert ret.status_code == 302
+
+    db.session.expire_all()
+    persons = [db.session.get(Person, i) for i in ids]
+    assert all(p.membership_status_id == MembershipStatus.CONFIRMED for p in persons)
+    assert persons[0].joining_date == date.today()
+    assert persons[2].joining_date == date(2020, 1, 1)
+    assert persons[0].status_changed_at > before
+    # only new members are welcomed
+    assert sorted(m.recipients[0] for m in outbox) == [
+        "applicant0@example.org",
+        "applicant1@example.org",
+    ]
+
+    client.get("/logout")
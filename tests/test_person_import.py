@@ -0,0 +1,122 @@
+CSV = """﻿name,email,membership_type,membership_status,joining_date,comment
+Import Person 1,import1@example.org,ordentlich,confirmed,2020-01-01,
+Import Person 2,import2@example.org,,,,no type
+Import Person 3,not an email,,,,
+,import4@example.org,,,,
+Import Person 5,import5@example.org,ordentlich,unknown,,
+Import Person 6,import6@example.org,,,01.01.2020,
+Import Person 2 Renamed,import2@example.org,ausserordentlich,,,duplicate
+"""
+
+
+def test_import_persons_command(client, app, tmp_path):
+    from datetime import date
+    from member_database.models import db, Person, MembershipStatus
+
+    client.get("/")
+    existing = Person(
+        name="Existing Person",
+        email="import1@example.org",
+        membership_type_id="ausserordentlich",
+        membership_status_id=MembershipStatus.PENDING,
+        date_of_birth=date(1990, 5, 1),
+    )
+    db.session.add(existing)
+    db.session.commit()
+    existing_id = existing.id
+
+    path = tmp_path / "persons.csv"
+    path.write_text(CSV, encoding="utf-8")
+    runner = app.test_cli_runner()
+
+    result = runner.invoke(args=["import-persons", str(path), "--dry-run"])
+    assert result.exit_code == 0, result.output
+    assert "inserted: 1" in result.output
+    assert Person.query.filter_by(email="import2@example.org").count() == 0
+
+    result = runner.invoke(
+        args=["import-persons", str(path), "--batch-size", "2", "--status", "pending"]
+    )
+    assert result.exit_code == 0, result.output
+    assert "rows: 7" in result.output
+    assert "errors: 4" in result.output
+    assert "line 4: email:" in result.output
+    assert "line 5: name:" in result.output
+    assert "line 6: membership_status:" in result.output
+    assert "line 7: joining_date:" in result.output
+
+    db.session.expire_all()
+    updated = db.session.get(Person, existing_id)
+    assert updated.name == "Import Person 1"
+    assert updated.membership_type_id == "ordentlich"
+    assert updated.membership_status_id == MembershipStatus.CONFIRMED
+    assert str(updated.joining_date) == "2020-01-01"
+    # empty cells keep existing values
+    assert str(updated.date_of_birth) == "1990-05-01"
+
+    # the later row wins, rows without status get --status
+    new = Person.query.filter_by(email="import2@example.org").one()
+    assert new.name == "Import Person 2 Renamed"
+    assert new.membership_type_id == "ausserordentlich"
+    assert new.membership_status_id == MembershipStatus.PENDING
+    assert new.status_changed_at is not None
+    assert Person.query.filter(Person.email.like("import%@example.org")).count() == 2
+
+    path.write_text("name,mail\nNo Email,x@example.org\n")
+    result = runner.invoke(args=["import-persons", str(path)])
+    assert result.exit_code != 0
+    assert "Missing columns: email" in result.output
+
+
+def test_admin_import_persons(app, client, admin_user, monkeypatch):
+    import io
+    from member_database.models import Person
+    from tests.test_events import grant_access
+
+    grant_access(admin_user, "person_admin")
+    client.post("/login/", data=admin_user.login_data)
+
+    ret = client.get("/admin/person/")
+    assert "/admin/person/import/" in ret.data.decode("utf-8")
+
+    data = "name,email\nUpload Person,upload@example.org\nBroken,broken\n"
+    ret = client.post(
+        "/admin/person/import/",
+        data={"file": (io.BytesIO(data.encode("utf-8")), "persons.csv")},
+        content_type="multipart/form-data",
+    )
+    assert ret.status_code == 200
+    text = " ".join(ret.data.decode("utf-8").split())
+    assert "2 Zeilen, 1 neu, 0 aktualisiert, 1 fehlerhaft" in text
+    assert Person.query.filter_by(email="upload@example.org").one().name == (
+        "Upload Person"
+    )
+
+    # larger files have to be imported with the cli
+    monkeypatch.setitem(app.config, "IMPORT_MAX_ROWS", 2)
+    data = "name,email\n" + "".join(
+        f"Too Many {i},toomany{i}@example.org\n" for i in range(3)
+    )
+    ret = client.post(
+        "/admin/person/import/",
+        data={"file": (io.BytesIO(data.encode("utf-8")), "persons.csv")},
+        content_type="multipart/form-data",
+    )
+    assert ret.status_code == 200
+    text = ret.data.decode("utf-8")
+    assert "Höchstens 2 Zeilen" in text
+    assert Person.query.filter(Person.email.like("toomany%")).count() == 0
+
+    # exactly at the limit is imported
+    data = "name,email\n" + "".join(
+        f"Too Many {i},toomany{i}@example.org\n" for i in range(2)
+    )
+    ret = client.post(
+        "/admin/person/import/",
+        data={"file": (io.BytesIO(data.encode("utf-8")), "persons.csv")},
+        content_type="multipart/form-data",
+    )
+    assert "Höchstens" not in ret.data.decode("utf-8")
+    assert Person.query.filter(Person.email.like("toomany%")).count() == 2
+
+    client.get("/logout")
@@ -0,0 +1,107 @@
+def ranked_search(term, fuzzy=False):
+    from member_database.models import db, Person, person_search
+
+    ids = [row[0] for row in db.session.execute(person_search(term, fuzzy))]
+    names = {p.id: p.name for p in Person.query.filter(Person.id.in_(ids))}
+    return [names[i] for i in ids]
+
+
+def search(term, fuzzy=False):
+    return set(ranked_search(term, fuzzy))
+
+
+def test_person_search(client):
+    from sqlalchemy import update
+    from member_database.models import db, Person
+
+    db.session.add_all(
+        [
+            Person(name="Emmy Noether", email="enoether@example.org"),
+            Person(name="Emil Noether", email="emil@example.net"),
+            Person(name="Paul Dirac", email="pdirac_100%@example.org"),
+        ]
+    )
+    db.session.commit()
+
+    assert search("noether") == {"Emmy Noether", "Emil Noether"}
+    assert search("EXAMPLE.NET") == {"Emil Noether"}
+    # wildcards are matched literally
+    assert search("_100%") == {"Paul Dirac"}
+    assert search("c%1") == set()
+    # too short for trigrams
+    assert "Emmy Noether" in search("mm")
+
+    # the closest match first, the order of the words does not matter
+    assert ranked_search("Nöther Emmy", fuzzy=True)[0] == "Emmy Noether"
+    # a typo
+    assert {"Emmy Noether", "Emil Noether"} <= search("Noeter", fuzzy=True)
+
+    # the index follows writes, also those bypassing the orm
+    emil = Person.query.filter_by(email="emil@example.net").one()
+    emil.name = "Emil Artin"
+    db.session.commit()
+    assert search("noether") == {"Emmy Noether"}
+
+    db.session.execute(
+        update(Person)
+        .where(Person.email == "pdirac_100%@example.org")
+        .values(name="P. A. M. Dirac")
+    )
+    db.session.commit()
+    assert search("dirac") == {"P. A. M. Dirac"}
+
+    db.session.delete(emil)
+    db.session.commit()
+    assert search("artin") == set()
+
+
+def test_person_admin_search(client, admin_user):
+    from tests.test_events import grant_access
+
+    grant_access(admin_user, "person_admin", "user_admin", "member_management")
+    client.post("/login/", data=admin_user.login_data)
+
+    ret = client.get("/admin/person/?search=noether")
+    assert ret.status_code == 200
+    text = ret.data.decode("utf-8")
+    assert "Emmy Noether" in text
+    assert "Richard Feynman" not in text
+    # the pager counts the search results only
+    assert "List (1)" in text
+
+    ret = client.get("/admin/person/?search=~Feinman")
+    assert ret.status_code == 200
+    assert "Richard Feynman" in ret.data.decode("utf-8")
+
+    ret = client.get("/admin/user/?search=feynman")
+    assert ret.status_code == 200
+    assert "rfeynman" in ret.data.decode("utf-8")
+
+    ret = client.get("/applications?q=noether")
+    assert ret.status_code == 200
+
+    client.get("/logout")
+
+
+def test_search_triggers_restored(client):
+    import pytest
+    from sqlalchemy import text
+    from member_database.models import db, Person
+    from member_database.models.search import ensure_search_triggers
+
+    if db.engine.dialect.name != "sqlite":
+        pytest.skip("only sqlite uses triggers")
+
+    assert not ensure_search_triggers(db.session.connection())
+
+    # as after a batch migration recreated the person table
+    db.session.execute(text("DROP TRIGGER person_search_insert"))
+    db.session.add(Person(name="Hedwig Kohn", email="hkohn@example.org"))
+    db.session.commit()
+    assert search("kohn") == set()
+
+    assert ensure_search_triggers(db.session.connection())
+    db.session.add(Person(name="Hertha Ayrton", email="hayrton@example.org"))
+    db.session.commit()
+    assert search("kohn") == {"Hedwig Kohn"}
+    assert search("ayrton") == {"Hertha Ayrton"}
@@ -0,0 +1,54 @@
+import sqlite3
+
+import pytest
+from sqlalchemy import exc
+from sqlalchemy.engine import make_url
+
+
+def test_pool_metrics():
+    from member_database.metrics import metrics
+    from member_database.models.pool import InstrumentedQueuePool
+
+    pool = InstrumentedQueuePool(
+        lambda: sqlite3.connect(":memory:"), pool_size=1, max_overflow=1, timeout=0.1
+    )
+    metrics.reset()
+
+    first = pool.connect()
+    second = pool.connect()
+    snapshot = metrics.snapshot()
+    assert snapshot["database.pool.checkouts"] == 2
+    assert snapshot["database.pool.in_use"] == 2
+    assert snapshot["database.pool.overflow"] == 1
+    assert snapshot["database.pool.overflow_connections"] == 1
+
+    with pytest.raises(exc.TimeoutError):
+        pool.connect()
+    snapshot = metrics.snapshot()
+    assert snapshot["database.pool.timeouts"] == 1
+    assert snapshot["database.pool.checkout_seconds"] >= 0.1
+
+    first.close()
+    second.close()
+    assert metrics.snapshot()["database.pool.in_use"] == 0
+    pool.dispose()
+
+
+def test_pool_options(app, monkeypatch):
+    from sqlalchemy.pool import NullPool
+    from member_database.models import db
+    from member_database.models.pool import InstrumentedQueuePool
+
+    url = make_url("postgresql://memberdb@localhost/memberdb")
+    _, options = db.apply_driver_hacks(app, url, {})
+    assert options["poolclass"] is InstrumentedQueuePool
+    assert options["pool_size"] == app.config["DATABASE_POOL_SIZE"]
+
+    monkeypatch.setitem(app.config, "DATABASE_PGBOUNCER", True)
+    _, options = db.apply_driver_hacks(app, url, {})
+    assert options["poolclass"] is NullPool
+    assert "pool_size" not in options
+
+    # sqlite has no pool options
+    _, options = db.apply_driver_hacks(app, make_url("sqlite:////tmp/test.db"), {})
+    assert "pool_size" not in options
@@ -0,0 +1,81 @@
+import pytest
+
+
+def test_parse_rate():
+    from member_database.ratelimit import parse_rate
+
+    assert parse_rate("5/hour") == (5, 5 / 3600)
+    assert parse_rate("10/minutes") == (10, 10 / 60)
+
+
+@pytest.mark.parametrize("store_cls", ["memory", "sqlite"])
+def test_token_bucket(store_cls, tmp_path):
+    from member_database.ratelimit import MemoryBucketStore, SQLiteBucketStore
+
+    now = 0.0
+
+    def clock():
+        return now
+
+    if store_cls == "memory":
+        store = MemoryBucketStore(clock=clock)
+    else:
+        store = SQLiteBucketStore(tmp_path / "buckets.sqlite", clock=clock)
+
+    # 2 tokens per minute
+    rate = (2, 2 / 60)
+    assert store.take("a", *rate) == 0
+    assert store.take("a", *rate) == 0
+    assert store.take("a", *rate) == pytest.approx(30)
+
+    # other keys are independent
+    assert store.take("b", *rate) == 0
+
+    now += 30
+    assert store.take("a", *rate) == 0
+    assert store.take("a", *rate) > 0
+
+
+def test_rate_limit(app, client, test_person):
+    from member_database.mail import mail
+    from member_database.metrics import metrics
+
+    app.config["RATELIMIT_ENABLED"] = True
+    app.config["RATELIMIT_PER_ADDRESS"] = "2/hour"
+    try:
+        with mail.record_messages() as outbox:
+            for _ in range(2):
+                ret = client.post("/request_edit", data={"email": test_person.email})
+                assert ret.status_code == 302
+
+            ret = client.post("/request_edit", data={"email": test_person.email})
+            assert ret.status_code == 429
+            assert int(ret.headers["Retry-After"]) > 0
+
+            # GET requests are not limited
+            assert client.get("/request_edit").status_code == 200
+
+        assert len(outbox) == 2
+        assert metrics.snapshot()["ratelimit.request_edit.limited_address"] == 1
+    finally:
+        app.config["RATELIMIT_ENABLED"] = False
+
+
+def test_shared_limit(app, client, tmp_path, monkeypatch):
+    from member_database.ratelimit import get_store, SQLiteBucketStore
+
+    # two workers with their own store on the same file
+    path = tmp_path / "buckets.sqlite"
+    workers = [SQLiteBucketStore(path), SQLiteBucketStore(path)]
+    rate = (3, 3 / 3600)
+    waits = [workers[i % 2].take("a", *rate) for i in range(4)]
+    assert waits[:3] == [0, 0, 0]
+    assert waits[3] > 0
+
+    # the app uses a sqlite file unless "memory" is configured
+    monkeypatch.setitem(app.config, "RATELIMIT_STORAGE", str(path))
+    monkeypatch.delitem(app.extensions, "ratelimit", raising=False)
+    store = get_store()
+    assert isinstance(store, SQLiteBucketStore)
+    assert store.take("a", *rate) > 0
+    monkeypatch.delitem(app.extensions, "ratelimit")
@@ -0,0 +1,42 @@
+def test_replica_routing(client, app, tmp_path, monkeypatch):
+    from member_database.models import db, Person
+    from member_database.events import Event
+
+    monkeypatch.setitem(
+        app.config,
+        "SQLALCHEMY_BINDS",
+        {"replica": f"sqlite:///{tmp_path / 'replica.sqlite'}"},
+    )
+    replica = db.get_engine(app, bind="replica")
+    try:
+        db.Model.metadata.create_all(bind=replica)
+        with replica.begin() as connection:
+            connection.execute(
+                Event.__table__.insert(),
+                dict(id=1000, name="Replica Event", registration_schema={}),
+            )
+
+        # read-only endpoints are served by the replica
+        reader = app.test_client()
+        r = reader.get("/events/1000/")
+        assert r.status_code == 200
+        assert r.json["event"]["name"] == "Replica Event"
+
+        # writes go to the primary
+        writer = app.test_client()
+        r = writer.post(
+            "/persons", json=dict(name="Lise Meitner", email="lmeitner@example.org")
+        )
+        assert r.json["status"] == "success"
+        assert Person.query.filter_by(email="lmeitner@example.org").count() == 1
+        with replica.connect() as connection:
+            persons = connection.execute(Person.__table__.select()).fetchall()
+            assert len(persons) == 0
+
+        # after writing, the client reads from the primary
+        r = writer.get("/events/1000/")
+        assert r.status_code == 404
+        r = reader.get("/events/1000/")
+        assert r.status_code == 200
+    finally:
+        replica.dispose()
@@ -0,0 +1,179 @@
+from datetime import datetime, timedelta, timezone
+
+
+def test_retention(client, app, monkeypatch):
+    from member_database.models import db, Person, MembershipStatus
+    from member_database.events import (
+        ArchivedEventRegistration,
+        Event,
+        EventRegistration,
+    )
+    from member_database.retention import apply_retention, get_checkpoint
+
+    long_ago = datetime.now(timezone.utc) - timedelta(days=5 * 365)
+
+    def person(name, status, changed=long_ago):
+        p = Person(
+            name=name,
+            email=f"{name.lower().replace(' ', '.')}@example.org",
+            membership_status_id=status,
+        )
+        db.session.add(p)
+        db.session.flush()
+        p.status_changed_at = changed
+        return p
+
+    stale = [
+        person(f"Stale Person {i}", MembershipStatus.EMAIL_UNVERIFIED) for i in range(5)
+    ]
+    recent = person("Recent Person", MembershipStatus.EMAIL_UNVERIFIED, changed=None)
+    confirmed = person("Confirmed Person", MembershipStatus.CONFIRMED)
+    registered = person("Registered Person", MembershipStatus.DENIED)
+    # still registered for an open event
+    busy = person("Busy Person", MembershipStatus.DENIED)
+
+    closed = Event(name="Old Event", registration_schema={}, registration_open=False)
+    undated = Event(
+        name="Undated Event", registration_schema={}, registration_open=False
+    )
+    archived = Event(
+        name="Archived Event",
+        registration_schema={},
+        registration_open=False,
+        archived_at=long_ago,
+    )
+    live = Event(name="Live Event", registration_schema={}, registration_open=True)
+    db.session.add_all([closed, undated, archived, live])
+    db.session.flush()
+    old_registrations = [
+        EventRegistration(
+            event=closed,
+            person=p,
+            data={"name": p.name},
+            timestamp=long_ago - timedelta(days=5 * 365),
+            status_name="confirmed",
+        )
+        for p in (registered, confirmed, busy)
+    ]
+    # from before timestamps were recorded
+    old_registrations.append(
+        EventRegistration(
+            event=undated, person=confirmed, data={}, status_name="confirmed"
+        )
+    )
+    live_registration = EventRegistration(
+        event=live,
+        person=busy,
+        data={"name": busy.name},
+        timestamp=datetime.now(timezone.utc),
+        status_name="confirmed",
+    )
+    # no timestamp, but archived recently enough to be kept
+    archived_registration = ArchivedEventRegistration(
+        event=archived, person=registered, data={"name": "x"}, status_name="confirmed"
+    )
+    db.session.add_all([*old_registrations, live_registration, archived_registration])
+    db.session.commit()
+    recent.status_changed_at = datetime.now(timezone.utc)
+    db.session.commit()
+
+    stale_ids = [p.id for p in stale]
+    ids = dict(
+        recent=recent.id,
+        confirmed=confirmed.id,
+        registered=registered.id,
+        busy=busy.id,
+    )
+    registration_ids = [r.id for r in old_registrations]
+    live_id = live_registration.id
+    archived_id = archived_registration.id
+
+    # older than the registrations of the other tests
+    monkeypatch.setitem(app.config, "RETENTION_EVENT_DAYS", 9 * 365)
+
+    report = apply_retention(batch_size=2, dry_run=True)
+    assert report["persons.email_unverified.deleted"] == 5
+    assert report["persons.denied.anonymised"] == 1
+    assert report["persons.denied.kept"] == 1
+    assert Person.query.filter(Person.id.in_(stale_ids)).count() == 5
+    assert get_checkpoint("persons:email_unverified") == 0
+
+    report = apply_retention(batch_size=2)
+    db.session.expire_all()
+    assert report["persons.email_unverified.deleted"] == 5
+    assert report["persons.denied.deleted"] == 0
+    assert report["persons.denied.anonymised"] == 1
+    assert report["persons.denied.kept"] == 1
+    assert Person.query.filter(Person.id.in_(stale_ids)).count() == 0
+    assert db.session.get(Person, ids["recent"]) is not None
+    assert db.session.get(Person, ids["confirmed"]).name == "Confirmed Person"
+
+    anonymised = db.session.get(Person, ids["registered"])
+    assert anonymised.name == "Anonymisiert"
+    assert anonymised.email.endswith("@anonymised.invalid")
+    assert db.session.get(ArchivedEventRegistration, archived_id).data == {}
+
+    # the organisers of the live event still need the data
+    assert db.session.get(Person, ids["busy"]).name == "Busy Person"
+    assert db.session.get(EventRegistration, live_id).data == {"name": "Busy Person"}
+
+    # stale registrations are deleted, also without timestamp, that
+    # includes the unconfirmed registrations of the other tests
+    assert report["registrations.deleted"] >= 4
+    assert report["archived_registrations.deleted"] == 0
+    assert (
+        EventRegistration.query.filter(
+            EventRegistration.id.in_(registration_ids)
+        ).count()
+        == 0
+    )
+    # open events are not touched
+    assert EventRegistration.query.count() > 0
+
+    # a complete pass resets the checkpoint, a second run finds nothing new
+    assert get_checkpoint("persons:email_unverified") == 0
+    report = apply_retention(batch_size=2)
+    assert report["persons.email_unverified.deleted"] == 0
+    assert report["persons.denied.anonymised"] == 0
+    assert report["persons.denied.kept"] == 1
+    assert report["registrations.deleted"] == 0
+
+
+def test_retention_resumes_at_checkpoint(client, app, monkeypatch):
+    from member_database.models import db, Person, MembershipStatus
+    from member_database.retention import (
+        process_persons,
+        run_task,
+        set_checkpoint,
+        stale_persons,
+    )
+
+    long_ago = datetime.now(timezone.utc) - timedelta(days=500)
+    persons = [
+        Person(
+            name=f"Denied Person {i}",
+            email=f"denied{i}@example.org",
+            membership_status_id=MembershipStatus.DENIED,
+        )
+        for i in range(4)
+    ]
+    db.session.add_all(persons)
+    db.session.flush()
+    for p in persons:
+        p.status_changed_at = long_ago
+    ids = sorted(p.id for p in persons)
+
+    # as if an earlier run was interrupted after the first two
+    set_checkpoint("persons:denied", ids[1])
+    db.session.commit()
+
+    deleted, anonymised, kept = run_task(
+        "persons:denied",
+        stale_persons(MembershipStatus.DENIED, 365),
+        Person.id,
+        process_persons,
+        batch_size=10,
+    )
+    assert (deleted, anonymised, kept) == (2, 0, 0)
+    remaining = {p.id for p in Person.query.filter(Person.id.in_(ids))}
+    assert remaining == set(ids[:2])
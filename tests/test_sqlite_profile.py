@@ -0,0 +1,114 @@
+from concurrent.futures import ThreadPoolExecutor
+import sqlite3
+
+
+def test_sqlite_profile(tmp_path):
+    from config import TestingConfig
+    from member_database import create_app
+    from member_database.models import db
+
+    class ProfileConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'profile.sqlite'}"
+        SQLITE_PROFILE = True
+        SQLITE_BUSY_TIMEOUT = 1234
+
+    app = create_app(ProfileConfig)
+    engine = db.get_engine(app)
+    try:
+        with engine.connect() as connection:
+            pragma = lambda name: connection.exec_driver_sql(f"PRAGMA {name}").scalar()
+            assert pragma("journal_mode") == "wal"
+            assert pragma("busy_timeout") == 1234
+            # NORMAL
+            assert pragma("synchronous") == 1
+            assert pragma("foreign_keys") == 1
+    finally:
+        engine.dispose()
+
+
+def test_sqlite_profile_writing_get(tmp_path):
+    from sqlalchemy import event as sa_event
+    from config import TestingConfig
+    from member_database import create_app
+    from member_database.models import db, Person
+    from member_database.events import Event, EventRegistration, registration_token
+
+    path = tmp_path / "profile.sqlite"
+
+    class ProfileConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{path}"
+        SQLITE_PROFILE = True
+        SQLITE_BUSY_TIMEOUT = 1000
+
+    app = create_app(ProfileConfig)
+    begins = []
+    concurrent_writes = []
+
+    def record_begin(conn, cursor, statement, *args):
+        if statement.startswith("BEGIN"):
+            begins.append(statement)
+
+    def concurrent_write(conn, cursor, statement, *args):
+        # another worker writes right after the first read of the request
+        if concurrent_writes or not statement.startswith("SELECT"):
+            return
+        other = sqlite3.connect(path, timeout=0.05)
+        try:
+            with other:
+                other.execute("UPDATE event SET name = name || '!'")
+            concurrent_writes.append("written")
+        except sqlite3.OperationalError:
+            concurrent_writes.append("blocked")
+        finally:
+            other.close()
+
+    def run():
+        with app.app_context():
+            engine = db.engine
+            sa_event.listen(engine, "before_cursor_execute", record_begin)
+            try:
+                db.create_all()
+                client = app.test_client()
+                # the first request hooks write, even for a read-only view
+                assert client.get("/events/").status_code == 200
+                assert client.get("/events/").status_code == 200
+                assert begins[0] == "BEGIN IMMEDIATE"
+                assert begins[-1] == "BEGIN"
+
+                event = Event(name="Profile", registration_schema={})
+                registration = EventRegistration(
+                    event=event,
+                    person=Person(name="Profile", email="profile@example.org"),
+                    status_name="pending",
+                    data={},
+                )
+                db.session.add(registration)
+                db.session.commit()
+                token = registration_token(registration)
+                registration_id = registration.id
+                db.session.remove()
+
+                # following the confirmation link is a GET request that writes
+                begins.clear()
+                sa_event.listen(engine, "after_cursor_execute", concurrent_write)
+                ret = client.get(f"/events/registration/{token}/")
+                sa_event.remove(engine, "after_cursor_execute", concurrent_write)
+                assert ret.status_code == 200
+                assert begins[0] == "BEGIN IMMEDIATE"
+                # the request held the write lock from the start
+                assert concurrent_writes == ["blocked"]
+                status = db.session.get(EventRegistration, registration_id).status_name
+                assert status == "confirmed"
+                db.session.remove()
+
+                begins.clear()
+                client.post("/events/resend_emails/", data={"email": "x@example.org"})
+                assert begins[0] == "BEGIN IMMEDIATE"
+            finally:
+                sa_event.remove(engine, "before_cursor_execute", record_begin)
+                engine.dispose()
+
+    # the database session is scoped to the thread, a separate thread keeps
+    # the teardown of this app from removing the session of the other tests
+    with ThreadPoolExecutor(1) as executor:
+        executor.submit(run).result()
@@ -0,0 +1,32 @@
+import pytest
+from itsdangerous import BadData
+
+
+def test_key_rotation(app):
+    from member_database.tokens import dumps_token, loads_token, get_serializer
+
+    secret_key = app.config["SECRET_KEY"]
+    with app.app_context():
+        old_token = dumps_token("foo@example.org", salt="test")
+        assert get_serializer("test") is get_serializer("test")
+
+        try:
+            app.config["SECRET_KEY"] = "new-key"
+            app.config["SECRET_KEY_FALLBACKS"] = [secret_key]
+
+            new_token = dumps_token("foo@example.org", salt="test")
+            assert new_token != old_token
+            assert loads_token(old_token, salt="test") == "foo@example.org"
+            assert loads_token(new_token, salt="test") == "foo@example.org"
+
+            # tokens are only valid for their salt
+            with pytest.raises(BadData):
+                loads_token(new_token, salt="other")
+
+            # after the old key is removed, old tokens are invalid
+            app.config["SECRET_KEY_FALLBACKS"] = []
+            with pytest.raises(BadData):
+                loads_token(old_token, salt="test")
+        finally:
+            app.config["SECRET_KEY"] = secret_key
+            app.config["SECRET_KEY_FALLBACKS"] = []